@@ -0,0 +1,74 @@
+"""
+Measures import time of option_pricing entry points, each in a fresh interpreter.
+
+Usage: python benchmarks/import_time.py [--repeat 5] [--top 10]
+"""
+# Standard library imports
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = [
+    'import option_pricing',
+    'from option_pricing import BinomialTreeModel',
+    'from option_pricing import BlackScholesModel',
+    'from option_pricing import MonteCarloPricing',
+    'from option_pricing import Ticker',
+    'from option_pricing import implied_volatility',
+]
+
+HEAVY_MODULES = ['scipy', 'pandas', 'requests', 'matplotlib', 'pandas_datareader', 'requests_cache', 'aiohttp']
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(statement, repeat):
+    """Returns median import time in seconds over repeat fresh interpreters and heavy modules it loaded."""
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+                                cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result['seconds'])
+    return statistics.median(times), result['loaded']
+
+
+def slowest_modules(statement, top):
+    """Returns top modules by cumulative import time (microseconds) reported by python -X importtime."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        modules.append((int(cumulative), name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='number of fresh interpreters per statement')
+    parser.add_argument('--top', type=int, default=0, help='also list slowest imported modules of every statement')
+    args = parser.parse_args()
+
+    for statement in STATEMENTS:
+        seconds, loaded = measure(statement, args.repeat)
+        print(f'{seconds * 1000:8.1f} ms  {statement:<50} heavy: {", ".join(loaded) or "-"}')
+        for cumulative, name in slowest_modules(statement, args.top):
+            print(f'{"":14}{cumulative / 1000:8.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""
+Benchmark suite of option pricing models and backends.
+
+Sweeps binomial lattice steps, Monte Carlo path counts, Black-Scholes batch sizes and latency of remote (Spark)
+pricing against local stub server, and appends results as one JSON line to history file, so runs of different
+releases can be compared.
+
+Usage: python benchmarks/run_benchmarks.py [--quick] [--only binomial,monte_carlo,black_scholes,remote]
+                                           [--repeat 3] [--history benchmarks/history.jsonl] [--compare 0.2]
+"""
+# Standard library imports
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import threading
+import subprocess
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Third party imports
+import numpy as np
+
+# Local package imports
+from option_pricing.BinomialTreeModel import binomial_tree_prices
+from option_pricing.BlackScholesModel import BlackScholesModel, black_scholes
+from option_pricing.MonteCarloSimulation import monte_carlo_european
+from option_pricing.spark import SparkClient
+
+DEFAULT_HISTORY = os.path.join(ROOT, 'benchmarks', 'history.jsonl')
+
+# Reference contract used by all benchmarks: spot, strike, years to maturity, risk-free rate, volatility
+CONTRACT = (100.0, 100.0, 1.0, 0.05, 0.2)
+SEED = 42
+
+SWEEPS = {
+    'binomial': [1_000, 5_000, 10_000, 50_000, 100_000],
+    'monte_carlo': [10_000, 100_000, 1_000_000, 10_000_000],
+    'black_scholes': [1, 100, 10_000, 1_000_000],
+    'remote': [1, 16, 64]
+}
+
+QUICK_SWEEPS = {
+    'binomial': [1_000, 5_000],
+    'monte_carlo': [10_000, 100_000],
+    'black_scholes': [1, 10_000],
+    'remote': [1, 16]
+}
+
+
+def timed(function, repeat):
+    """Runs function once untimed, then repeat times timed, and returns list of durations in seconds."""
+    # Warmup run pays for lazy imports, opening pooled connections and first-touch allocations
+    function()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def result(benchmark, parameter, durations, **extra):
+    """Builds result record of one benchmark point."""
+    record = {
+        'benchmark': benchmark,
+        'parameter': parameter,
+        'repeat': len(durations),
+        'seconds_min': min(durations),
+        'seconds_median': statistics.median(durations)
+    }
+    record.update(extra)
+    return record
+
+
+def bench_binomial(sizes, repeat):
+    for steps in sizes:
+        durations = timed(lambda: binomial_tree_prices(*CONTRACT, steps), repeat)
+        yield result('binomial', steps, durations)
+
+
+def bench_monte_carlo(sizes, repeat):
+    for paths in sizes:
+        durations = timed(lambda: monte_carlo_european(*CONTRACT, paths, seed=SEED), repeat)
+        yield result('monte_carlo', paths, durations)
+
+
+def bench_black_scholes(sizes, repeat):
+    rng = np.random.default_rng(SEED)
+    for size in sizes:
+        contracts = np.tile(CONTRACT, (size, 1))
+        contracts[:, 1] = rng.uniform(50, 150, size)
+        durations = timed(lambda: black_scholes(*contracts.T), repeat)
+        yield result('black_scholes', size, durations, contracts_per_second=size / statistics.median(durations))
+
+
+class _StubSparkHandler(BaseHTTPRequestHandler):
+    """Answers Spark Execute requests with local Black-Scholes outputs."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, with Nagle's algorithm every response would wait for delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        inputs = body['request_data']['inputs']
+        outputs = black_scholes(inputs['StockPrice'], inputs['ExercisePrice'], inputs['TimeToExpiry'],
+                                inputs['RisklessRate'], inputs['StdDev'])
+        response = json.dumps({'response_data': {'outputs': {key: float(value) for key, value in outputs.items()}}})
+        response = response.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_remote(sizes, repeat):
+    """
+    Latency of Spark backend against local stub server (measures client overhead: serialization, pooled
+    connections, concurrency), with response cache disabled so every call goes over HTTP.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubSparkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = SparkClient(base_url=f'http://127.0.0.1:{server.server_port}', cache=None, pool_size=max(sizes))
+    try:
+        S, K, T, r, sigma = CONTRACT
+        single = lambda: BlackScholesModel(S, K, T * 365, r, sigma, spark_client=client).calculate_option_price('Call Option')
+        latencies = timed(single, max(repeat, 50))
+        yield result('remote', 1, latencies, p95_seconds=float(np.percentile(latencies, 95)))
+
+        for size in [size for size in sizes if size > 1]:
+            contracts = np.tile(CONTRACT, (size, 1))
+            contracts[:, 1] = np.linspace(50, 150, size)
+            durations = timed(lambda: BlackScholesModel.price_batch(contracts, spark_client=client), repeat)
+            yield result('remote', size, durations, requests_per_second=size / statistics.median(durations))
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+BENCHMARKS = {
+    'binomial': bench_binomial,
+    'monte_carlo': bench_monte_carlo,
+    'black_scholes': bench_black_scholes,
+    'remote': bench_remote
+}
+
+
+def environment():
+    """Returns metadata identifying code version and machine of the run."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.node(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def previous_run(history, machine):
+    """Returns the last recorded run from the same machine, None if there's none."""
+    if not os.path.exists(history):
+        return None
+    last = None
+    with open(history) as f:
+        for line in f:
+            run = json.loads(line)
+            if run['environment']['machine'] == machine:
+                last = run
+    return last
+
+
+def compare(run, previous, threshold):
+    """Prints benchmark points slower than in previous run by more than threshold. Returns number of regressions."""
+    baseline = {(r['benchmark'], r['parameter']): r['seconds_median'] for r in previous['results']}
+    regressions = 0
+    for record in run['results']:
+        before = baseline.get((record['benchmark'], record['parameter']))
+        if before is None:
+            continue
+        change = record['seconds_median'] / before - 1
+        if change > threshold:
+            regressions += 1
+            print(f"REGRESSION {record['benchmark']}[{record['parameter']}]: {before:.4f}s -> "
+                  f"{record['seconds_median']:.4f}s ({change:+.0%}) vs {previous['environment']['commit']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Option pricing benchmark suite')
+    parser.add_argument('--quick', action='store_true', help='run small sweep sizes only')
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help='comma separated benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs per point')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON lines file results are appended to')
+    parser.add_argument('--compare', type=float, default=None, metavar='THRESHOLD',
+                        help='compare with previous run on this machine, exit with status 1 if any point is slower '
+                             'by more than THRESHOLD (e.g. 0.2 for 20%%)')
+    args = parser.parse_args()
+    names = args.only.split(',')
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks {', '.join(unknown)} in --only, choose from {', '.join(BENCHMARKS)}")
+
+    sweeps = QUICK_SWEEPS if args.quick else SWEEPS
+    run = {'environment': environment(), 'quick': args.quick, 'results': []}
+    for name in names:
+        for record in BENCHMARKS[name](sweeps[name], args.repeat):
+            print(f"{record['benchmark']:>14} {record['parameter']:>10}  median {record['seconds_median']:.6f}s  "
+                  f"min {record['seconds_min']:.6f}s")
+            run['results'].append(record)
+
+    previous = previous_run(args.history, run['environment']['machine'])
+    with open(args.history, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+    if args.compare is not None:
+        if previous is None:
+            print(f"No previous run on machine {run['environment']['machine']} in {args.history}, nothing to compare")
+        elif compare(run, previous, args.compare):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,284 @@
+# Standard library imports
+from enum import Enum
+
 # Third party imports
 import numpy as np
 
 # Local package imports
-from .base import OptionPricingModel
+from . import metrics
+from .base import CONTRACT_COLUMNS, OptionPricingModel, contracts_frame, resolve_sigma
+from .BlackScholesModel import black_scholes
+
+# Option values below threshold are treated as zero during backward induction (see binomial_tree_prices)
+UNDERFLOW_THRESHOLD = 1e-250
+FLUSH_INTERVAL = 32
+
+# Memory available for lattice buffers when pricing batch of contracts in one sweep
+LATTICE_MEMORY_LIMIT = 256 * 2 ** 20
+
+
+class TREE_TYPE(Enum):
+    CRR = 'crr'                         # Cox-Ross-Rubinstein
+    LEISEN_REIMER = 'leisen_reimer'     # Leisen-Reimer (Peizer-Pratt inversion), uses odd number of steps
+    BBS = 'bbs'                         # Binomial Black-Scholes: last step replaced by Black-Scholes prices
+
+
+def _peizer_pratt(z, n):
+    """Peizer-Pratt (method 2) inversion of normal distribution into binomial probability for n steps."""
+    return 0.5 + np.sign(z) * np.sqrt(0.25 - 0.25 * np.exp(-(z / (n + 1 / 3 + 0.1 / (n + 1))) ** 2 * (n + 1 / 6)))
+
+
+def _lattice_parameters(S, K, T, r, sigma, n, tree_type):
+    """Returns log up factors, log down factors, up probabilities and one-step compounded returns of lattices."""
+    dT = T / n
+    a = np.exp(r * dT)           # risk free compounded return
+
+    if tree_type == TREE_TYPE.LEISEN_REIMER.value:
+        vol = sigma * np.sqrt(T)
+        d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / vol
+        d2 = d1 - vol
+        p = _peizer_pratt(d2, n)
+        u = a * _peizer_pratt(d1, n) / p
+        d = (a - p * u) / (1.0 - p)
+        return np.log(u), np.log(d), p, a
+
+    # Delta t, up and down factors
+    log_u = sigma * np.sqrt(dT)
+    u = np.exp(log_u)
+    d = 1.0 / u
+    p = (a - d) / (u - d)        # risk neutral up probability
+    return log_u, -log_u, p, a
+
+
+def _rollback(S, K, T, r, sigma, n, tree_type, keep_nodes=False, progress=None):
+    """
+    Builds lattices of n steps for flattened contract arrays and rolls back call and put values.
+    Returns array of values at valuation date (call columns followed by put columns), dictionary with copies of
+    node values at steps 1 and 2 if keep_nodes is set (empty otherwise), and log up/down factors of lattices.
+    If progress callback is given, it's called periodically with fraction of work done.
+    """
+    m = S.size
+    log_u, log_d, p, a = _lattice_parameters(S, K, T, r, sigma, n, tree_type)
+    q = 1.0 - p                  # risk neutral down probability
+    # Discounting folded into transition probabilities, repeated for call and put columns
+    p_discounted = np.tile(p / a, 2)
+    q_discounted = np.tile(q / a, 2)
+
+    # With BBS the lattice ends one step before expiry, where option values are given by Black-Scholes formula
+    steps = n - 1 if tree_type == TREE_TYPE.BBS.value else n
+
+    # Underlying asset prices at the last lattice step: S * u^j * d^(steps-j)
+    j = np.arange(steps + 1)
+    S_T = S * np.exp(np.multiply.outer(j, log_u) + np.multiply.outer(steps - j, log_d))
+
+    # Option values at the last lattice step, row per node, call columns followed by put columns
+    V = np.empty((steps + 1, 2 * m))
+    if tree_type == TREE_TYPE.BBS.value:
+        outputs = black_scholes(S_T, K, T / n, r, sigma)
+        V[:, :m] = outputs['callprice']
+        V[:, m:] = outputs['putprice']
+        del outputs
+    else:
+        np.subtract(S_T, K, out=V[:, :m])
+        np.subtract(K, S_T, out=V[:, m:])
+        np.maximum(V, 0.0, out=V)
+    del S_T
+    up_values = np.empty((steps, 2 * m))
+
+    nodes = {}
+    if keep_nodes and steps in (1, 2):
+        nodes[steps] = V.copy()
+
+    # Overriding option values in place, at step i only first i nodes are alive
+    for i in range(steps, 0, -1):
+        np.multiply(V[1:i + 1], p_discounted, out=up_values[:i])
+        V[:i] *= q_discounted
+        V[:i] += up_values[:i]
+
+        # Far out-of-the-money values decay towards subnormal floats, which make arithmetic many times slower.
+        # Values below UNDERFLOW_THRESHOLD are flushed to zero, periodically so the check is cheap.
+        if i % FLUSH_INTERVAL == 0:
+            np.putmask(V[:i], V[:i] < UNDERFLOW_THRESHOLD, 0.0)
+            if progress is not None:
+                # Work of step i is proportional to i, so steps..i make 1 - (i / steps)^2 of the total
+                progress(1.0 - (i / steps) ** 2)
+
+        # V[:i] now holds node values at step i - 1
+        if keep_nodes and i - 1 in (1, 2):
+            nodes[i - 1] = V[:i].copy()
+
+    if progress is not None:
+        progress(1.0)
+    return V[0], nodes, log_u, log_d
+
+
+def _rollback_prices(S, K, T, r, sigma, n, tree_type, progress=None):
+    """
+    Builds lattices of n steps for flattened contract arrays and rolls back call and put values.
+    Returns tuple of arrays (call prices, put prices).
+    """
+    values = _rollback(S, K, T, r, sigma, n, tree_type, progress=progress)[0]
+    return values[:S.size], values[S.size:]
+
+
+def _number_of_steps(number_of_time_steps, tree_type):
+    """Returns number of lattice steps used for tree type (Leisen-Reimer needs odd number of steps)."""
+    if tree_type == TREE_TYPE.LEISEN_REIMER.value:
+        return number_of_time_steps + 1 - number_of_time_steps % 2
+    return number_of_time_steps
+
+
+def _check_richardson(n, n_coarse, tree_type):
+    """Raises ValueError if two-point Richardson extrapolation can't be applied to lattices of n and n_coarse steps."""
+    if tree_type == TREE_TYPE.CRR.value:
+        # CRR error oscillates with parity of the number of steps instead of decaying smoothly, extrapolation amplifies it
+        raise ValueError("Richardson extrapolation needs 'leisen_reimer' or 'bbs' tree type, CRR error isn't smooth in number of steps")
+    if n_coarse >= n:
+        raise ValueError(f'Richardson extrapolation needs at least 2 time steps, got {n}')
+
+
+def _richardson_weight(n, n_coarse, tree_type):
+    """Returns weight w of two-point Richardson extrapolation w * P(n) + (1 - w) * P(n_coarse)."""
+    # Leading error term is of order 1/n^2 for Leisen-Reimer and smooth 1/n for BBS
+    order = 2 if tree_type == TREE_TYPE.LEISEN_REIMER.value else 1
+    return n ** order / (n ** order - n_coarse ** order)
+
+
+def binomial_tree_prices(S, K, T, r, sigma, number_of_time_steps, tree_type=TREE_TYPE.CRR.value, richardson=False,
+                         progress=None):
+    """
+    Calculates European call and put prices on binomial lattices.
+    Parameters can be scalars or arrays (broadcasted against each other, e.g. strike chain or set of maturities):
+    every contract gets its own column, and all columns are rolled back together in one vectorized sweep.
+    Terminal prices are built in a single vectorized operation, and backward induction runs in place in preallocated
+    buffers holding call and put values side by side, so no arrays are allocated inside the O(n^2) loop.
+    Returns tuple (call prices, put prices) shaped like broadcasted parameters.
+
+    Leisen-Reimer and BBS trees converge much faster than CRR (errors of order 1/n^2 and smooth 1/n respectively),
+    and two-point Richardson extrapolation with a tree of about half the steps removes the leading error term,
+    so few hundred steps give accuracy CRR needs many thousands of steps for. Extrapolation isn't available for CRR,
+    whose error oscillates between odd and even numbers of steps.
+
+    Params:
+    S: underlying spot price
+    K: strike price
+    T: time to maturity in years
+    r: risk-free rate
+    sigma: volatility of the underlying asset
+    number_of_time_steps: number of time periods between the valuation date and exercise date
+    tree_type: lattice parameterisation, one of TREE_TYPE values ('crr', 'leisen_reimer', 'bbs')
+    richardson: apply two-point Richardson extrapolation (Leisen-Reimer and BBS trees, at least 2 time steps)
+    progress: callback called periodically with fraction of work done (between 0 and 1)
+    """
+    S, K, T, r, sigma = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (S, K, T, r, sigma)])
+    shape = S.shape
+    S, K, T, r, sigma = [x.ravel() for x in (S, K, T, r, sigma)]
+
+    n = _number_of_steps(number_of_time_steps, tree_type)
+    n_coarse = _number_of_steps(max(n // 2, 1), tree_type)
+    if richardson:
+        _check_richardson(n, n_coarse, tree_type)
+
+    # Rollback work grows with n^2, so with Richardson extrapolation fine tree makes n^2 / (n^2 + n_coarse^2) of it
+    fine_share = n ** 2 / (n ** 2 + n_coarse ** 2) if richardson else 1.0
+    fine_progress = coarse_progress = None
+    if progress is not None:
+        fine_progress = lambda done: progress(fine_share * done)
+        coarse_progress = lambda done: progress(fine_share + (1 - fine_share) * done)
+
+    call_prices, put_prices = _rollback_prices(S, K, T, r, sigma, n, tree_type, fine_progress)
+
+    if richardson:
+        coarse_call_prices, coarse_put_prices = _rollback_prices(S, K, T, r, sigma, n_coarse, tree_type, coarse_progress)
+
+        weight = _richardson_weight(n, n_coarse, tree_type)
+        call_prices = weight * call_prices + (1 - weight) * coarse_call_prices
+        put_prices = weight * put_prices + (1 - weight) * coarse_put_prices
+
+    return call_prices.reshape(shape)[()], put_prices.reshape(shape)[()]
+
+
+def _lattice_greeks(S, K, T, r, sigma, n, tree_type, sigma_bump, rate_bump):
+    """
+    Calculates prices and Greeks of flattened contract arrays from one rollback of n steps.
+    Lattices with bumped volatility and rate are added as extra columns of the same sweep.
+    """
+    m = S.size
+    columns = lambda x: np.tile(x, 5)
+    sigmas = np.concatenate([sigma, sigma + sigma_bump, sigma - sigma_bump, sigma, sigma])
+    rates = np.concatenate([r, r, r, r + rate_bump, r - rate_bump])
+    values, nodes, log_u, log_d = _rollback(columns(S), columns(K), columns(T), rates, sigmas, n, tree_type, keep_nodes=True)
+
+    # Underlying prices at nodes of steps 1 and 2 of unbumped lattices
+    log_u, log_d = log_u[:m], log_d[:m]
+    S_1 = S * np.exp([log_d, log_u])
+    S_2 = S * np.exp([2 * log_d, log_u + log_d, 2 * log_u])
+    dT = T / n
+
+    outputs = {}
+    for name, offset in (('call', 0), ('put', 5 * m)):
+        block = lambda b: slice(offset + b * m, offset + (b + 1) * m)
+        V_0 = values[block(0)]
+        V_1 = nodes[1][:, block(0)]
+        V_2 = nodes[2][:, block(0)]
+
+        delta = (V_1[1] - V_1[0]) / (S_1[1] - S_1[0])
+        gamma = ((V_2[2] - V_2[1]) / (S_2[2] - S_2[1]) - (V_2[1] - V_2[0]) / (S_2[1] - S_2[0])) / (0.5 * (S_2[2] - S_2[0]))
+        # Middle node two steps ahead has the same underlying price as valuation date in CRR lattice (u * d = 1),
+        # in other lattices its value is shifted back to spot price with Delta and Gamma
+        spot_shift = S_2[1] - S
+        V_middle = V_2[1] - delta * spot_shift - 0.5 * gamma * spot_shift ** 2
+
+        outputs[f'{name}price'] = V_0
+        outputs[f'{name.capitalize()}Delta'] = delta
+        outputs[f'{name.capitalize()}Gamma'] = gamma
+        outputs[f'{name.capitalize()}Theta'] = (V_middle - V_0) / (2 * dT)
+        outputs[f'{name.capitalize()}Vega'] = (values[block(1)] - values[block(2)]) / (2 * sigma_bump)
+        outputs[f'{name.capitalize()}Rho'] = (values[block(3)] - values[block(4)]) / (2 * rate_bump)
+    return outputs
+
+
+def binomial_tree_greeks(S, K, T, r, sigma, number_of_time_steps, tree_type=TREE_TYPE.CRR.value, richardson=False,
+                         sigma_bump=0.01, rate_bump=0.0001):
+    """
+    Calculates European call and put prices together with Greeks from single lattice sweep.
+    Delta, Gamma and Theta are read off the lattice nodes at first two steps of the same backward induction that
+    prices the options. Vega and Rho are central differences of lattices with bumped volatility and rate, which
+    reuse the same vectorized sweep as extra columns instead of separate rollbacks.
+    Returns dictionary with callprice, putprice and CallDelta, CallGamma, CallTheta, CallVega, CallRho
+    (and same Greeks of put), shaped like broadcasted parameters. Theta is per year.
+
+    Params:
+    S: underlying spot price
+    K: strike price
+    T: time to maturity in years
+    r: risk-free rate
+    sigma: volatility of the underlying asset
+    number_of_time_steps: number of time periods between the valuation date and exercise date (at least 3)
+    tree_type: lattice parameterisation, one of TREE_TYPE values ('crr', 'leisen_reimer', 'bbs')
+    richardson: apply two-point Richardson extrapolation (Leisen-Reimer and BBS trees only)
+    sigma_bump: volatility bump used for Vega
+    rate_bump: risk-free rate bump used for Rho
+    """
+    S, K, T, r, sigma = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (S, K, T, r, sigma)])
+    shape = S.shape
+    S, K, T, r, sigma = [x.ravel() for x in (S, K, T, r, sigma)]
+
+    n = _number_of_steps(number_of_time_steps, tree_type)
+    # Nodes of steps 1 and 2 must be part of the rolled back lattice (BBS lattice has n - 1 steps)
+    minimum_steps = 4 if richardson else 3
+    if n < minimum_steps:
+        raise ValueError(f'Lattice Greeks need at least {minimum_steps} time steps, got {n}')
+    outputs = _lattice_greeks(S, K, T, r, sigma, n, tree_type, sigma_bump, rate_bump)
+
+    if richardson:
+        n_coarse = _number_of_steps(max(n // 2, 3), tree_type)
+        _check_richardson(n, n_coarse, tree_type)
+        coarse_outputs = _lattice_greeks(S, K, T, r, sigma, n_coarse, tree_type, sigma_bump, rate_bump)
+        weight = _richardson_weight(n, n_coarse, tree_type)
+        outputs = {key: weight * value + (1 - weight) * coarse_outputs[key] for key, value in outputs.items()}
+
+    return {key: value.reshape(shape)[()] for key, value in outputs.items()}
 
 
 class BinomialTreeModel(OptionPricingModel):
@@ -15,70 +291,84 @@ class BinomialTreeModel(OptionPricingModel):
     - Sequential calculation of the option value at each preceding node
     """
 
-    def __init__(self, underlying_spot_price, strike_price, days_to_maturity, risk_free_rate, sigma, number_of_time_steps):
+    def __init__(self, underlying_spot_price, strike_price, days_to_maturity, risk_free_rate, sigma, number_of_time_steps,
+                 tree_type=TREE_TYPE.CRR.value, richardson=False, progress=None):
         """
         Initializes variables used in Black-Scholes formula .
 
         underlying_spot_price: current stock or other underlying spot price
-        strike_price: strike price for option cotract
-        days_to_maturity: option contract maturity/exercise date
+        strike_price: strike price for option cotract (or array of strikes, priced in one lattice sweep)
+        days_to_maturity: option contract maturity/exercise date (or array of maturities)
         risk_free_rate: returns on risk-free assets (assumed to be constant until expiry date)
-        sigma: volatility of the underlying asset (standard deviation of asset's log returns)
+        sigma: volatility of the underlying asset (standard deviation of asset's log returns) or volatility surface
         number_of_time_steps: number of time periods between the valuation date and exercise date
+        tree_type: lattice parameterisation, one of TREE_TYPE values ('crr', 'leisen_reimer', 'bbs')
+        richardson: apply two-point Richardson extrapolation (Leisen-Reimer and BBS trees only)
+        progress: callback called periodically with fraction of lattice rollback done (e.g. for progress bars)
         """
         self.S = underlying_spot_price
         self.K = strike_price
         self.T = days_to_maturity / 365
         self.r = risk_free_rate
-        self.sigma = sigma
+        self.sigma = resolve_sigma(sigma, self.K, self.T)
         self.number_of_time_steps = number_of_time_steps
+        self.tree_type = tree_type
+        self.richardson = richardson
+        self.progress = progress
 
-    def _calculate_call_option_price(self): 
-        """Calculates price for call option according to the Binomial formula."""
-        # Delta t, up and down factors
-        dT = self.T / self.number_of_time_steps                             
-        u = np.exp(self.sigma * np.sqrt(dT))                 
-        d = 1.0 / u                                    
+        # Call and put prices of the last priced parameters, both come from one lattice rollback
+        self._prices = None
 
-        # Price vector initialization
-        V = np.zeros(self.number_of_time_steps + 1)                       
+    @metrics.instrumented
+    def calculate_prices(self):
+        """Calculates call and put prices in one lattice rollback. Returns tuple (call price, put price)."""
+        parameters = (self.S, self.K, self.T, self.r, self.sigma, self.number_of_time_steps)
+        # Parameters may be arrays, so they are compared by value through their bytes
+        key = tuple((np.shape(x), np.asarray(x, dtype=float).tobytes()) for x in parameters) + (self.tree_type, self.richardson)
+        if self._prices is None or self._prices[0] != key:
+            self._prices = (key, binomial_tree_prices(*parameters, tree_type=self.tree_type, richardson=self.richardson,
+                                                               progress=self.progress))
+        return self._prices[1]
 
-        # Underlying asset prices at different time points
-        S_T = np.array( [(self.S * u**j * d**(self.number_of_time_steps - j)) for j in range(self.number_of_time_steps + 1)])
+    def _calculate_greeks(self):
+        """Calculates call/put prices with Delta, Gamma, Theta, Vega and Rho from one lattice sweep."""
+        return binomial_tree_greeks(self.S, self.K, self.T, self.r, self.sigma, self.number_of_time_steps,
+                                    tree_type=self.tree_type, richardson=self.richardson)
 
-        a = np.exp(self.r * dT)      # risk free compounded return
-        p = (a - d) / (u - d)        # risk neutral up probability
-        q = 1.0 - p                  # risk neutral down probability   
-
-        V[:] = np.maximum(S_T - self.K, 0.0)
-    
-        # Overriding option price 
-        for i in range(self.number_of_time_steps - 1, -1, -1):
-            V[:-1] = np.exp(-self.r * dT) * (p * V[1:] + q * V[:-1]) 
-
-        return V[0]
+    def _calculate_call_option_price(self): 
+        """Calculates price for call option according to the Binomial formula."""
+        return self.calculate_prices()[0]
 
     def _calculate_put_option_price(self): 
         """Calculates price for put option according to the Binomial formula."""  
-        # Delta t, up and down factors
-        dT = self.T / self.number_of_time_steps                             
-        u = np.exp(self.sigma * np.sqrt(dT))                 
-        d = 1.0 / u                                    
+        return self.calculate_prices()[1]
 
-        # Price vector initialization
-        V = np.zeros(self.number_of_time_steps + 1)                       
-
-        # Underlying asset prices at different time points
-        S_T = np.array( [(self.S * u**j * d**(self.number_of_time_steps - j)) for j in range(self.number_of_time_steps + 1)])
+    @classmethod
+    @metrics.instrumented
+    def price_batch(cls, contracts, number_of_time_steps, tree_type=TREE_TYPE.CRR.value, richardson=False):
+        """
+        Prices batch of contracts (e.g. whole strike chain) by rolling back their lattices together.
+        Contracts are split into sweeps so lattice buffers stay within LATTICE_MEMORY_LIMIT.
+        Returns DataFrame aligned with contracts (same index) with callprice and putprice columns.
 
-        a = np.exp(self.r * dT)      # risk free compounded return
-        p = (a - d) / (u - d)        # risk neutral up probability
-        q = 1.0 - p                  # risk neutral down probability   
+        Params:
+        contracts: DataFrame with columns S, K, T, r, sigma or array-like of such rows (T in years)
+        number_of_time_steps: number of time periods between the valuation date and exercise date
+        tree_type: lattice parameterisation, one of TREE_TYPE values ('crr', 'leisen_reimer', 'bbs')
+        richardson: apply two-point Richardson extrapolation (Leisen-Reimer and BBS trees only)
+        """
+        import pandas as pd
+        contracts = contracts_frame(contracts)
+        # Two buffers of (n + 1) x (2 * contracts) float64 values
+        bytes_per_contract = 2 * 2 * 8 * (number_of_time_steps + 1)
+        contracts_per_sweep = max(LATTICE_MEMORY_LIMIT // bytes_per_contract, 1)
 
-        V[:] = np.maximum(self.K - S_T, 0.0)
-    
-        # Overriding option price 
-        for i in range(self.number_of_time_steps - 1, -1, -1):
-            V[:-1] = np.exp(-self.r * dT) * (p * V[1:] + q * V[:-1]) 
+        call_prices = np.empty(len(contracts))
+        put_prices = np.empty(len(contracts))
+        values = contracts[CONTRACT_COLUMNS].values
+        for start in range(0, len(contracts), contracts_per_sweep):
+            chunk = values[start:start + contracts_per_sweep]
+            call_prices[start:start + len(chunk)], put_prices[start:start + len(chunk)] = binomial_tree_prices(
+                *chunk.T, number_of_time_steps, tree_type=tree_type, richardson=richardson)
 
-        return V[0]
\ No newline at end of file
+        return pd.DataFrame({'callprice': call_prices, 'putprice': put_prices}, index=contracts.index)
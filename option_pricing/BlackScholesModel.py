@@ -1,14 +1,72 @@
-import requests
+# Standard library imports
+import math
+
+# Third party imports
 import numpy as np
-from scipy.stats import norm 
-import json
 
 # Local package imports
-from .base import OptionPricingModel
+from . import metrics
+from .base import BACKEND, CONTRACT_COLUMNS, OptionPricingModel, contracts_frame, resolve_sigma
+
+
+def black_scholes(S, K, T, r, sigma):
+    """
+    Calculates closed-form Black-Scholes call/put prices and Greeks in one vectorized pass.
+    Arguments can be scalars or arrays (broadcasted against each other).
+    Returns dictionary with the same keys as Spark BlackScholes service outputs; Greeks are those of the call option,
+    with Theta per year, Vega per unit of volatility and Rho per unit of interest rate.
+
+    Params:
+    S: underlying spot price
+    K: strike price
+    T: time to maturity in years
+    r: risk-free rate
+    sigma: volatility of the underlying asset
+    """
+    from scipy.special import ndtr
+    S, K, T, r, sigma = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (S, K, T, r, sigma)])
+
+    sqrt_T = np.sqrt(T)
+    vol = sigma * sqrt_T
+    discount = np.exp(-r * T)
+
+    # With zero volatility or maturity option value is deterministic: d1, d2 go to +/- infinity
+    degenerate = vol <= 0
+    safe_vol = np.where(degenerate, 1.0, vol)
+    safe_sqrt_T = np.where(sqrt_T > 0, sqrt_T, 1.0)
+    log_moneyness = np.log(S / K)
+
+    d1 = (log_moneyness + (r + 0.5 * sigma ** 2) * T) / safe_vol
+    d1 = np.where(degenerate, np.where(log_moneyness + r * T > 0, np.inf, -np.inf), d1)
+    d2 = np.where(degenerate, d1, d1 - vol)
+
+    N_d1 = ndtr(d1)
+    N_d2 = ndtr(d2)
+    n_d1 = np.exp(-0.5 * d1 ** 2) / math.sqrt(2 * math.pi)
+
+    call_price = S * N_d1 - K * discount * N_d2
+    # Put-call parity: C - P = S - PresentValue(K)
+    put_price = call_price - S + K * discount
+
+    return {
+        'callprice': call_price,
+        'putprice': put_price,
+        'Delta': N_d1,
+        'Gamma': n_d1 / (S * safe_vol),
+        'Theta': -S * n_d1 * sigma / (2 * safe_sqrt_T) - r * K * discount * N_d2,
+        'Vega': S * n_d1 * sqrt_T,
+        'Rho': K * T * discount * N_d2
+    }
+
 
 class BlackScholesModel(OptionPricingModel):
+
+    SPARK_SERVICE = "BlackScholes"
+    # Single service version returns call/put prices and Greeks in one response
+    VERSION_ID = "49294d02-b796-4966-8d2f-c76193ebad6b"
+    OUTPUT_COLUMNS = ['callprice', 'putprice', 'Delta', 'Gamma', 'Theta', 'Vega', 'Rho']
     
-    def __init__(self, underlying_spot_price, strike_price, days_to_maturity, risk_free_rate, sigma):
+    def __init__(self, underlying_spot_price, strike_price, days_to_maturity, risk_free_rate, sigma, spark_client=None, async_spark_client=None, backend=BACKEND.SPARK.value):
         """
         Initializes variables used in Black-Scholes formula .
 
@@ -16,128 +74,132 @@ class BlackScholesModel(OptionPricingModel):
         strike_price: strike price for option cotract
         days_to_maturity: option contract maturity/exercise date
         risk_free_rate: returns on risk-free assets (assumed to be constant until expiry date)
-        sigma: volatility of the underlying asset (standard deviation of asset's log returns)
+        sigma: volatility of the underlying asset (standard deviation of asset's log returns) or volatility surface
+        spark_client: Spark client used for pricing requests (shared pooled client by default)
+        async_spark_client: asynchronous Spark client used by *_async methods (shared client by default)
+        backend: 'spark' for pricing with Spark BlackScholes service, 'local' for closed-form NumPy calculation
         """
         self.S = underlying_spot_price
         self.K = strike_price
         self.T = days_to_maturity / 365
         self.r = risk_free_rate
-        self.sigma = sigma
-        
+        self.sigma = resolve_sigma(sigma, self.K, self.T)
+        self.spark_client = spark_client
+        self.async_spark_client = async_spark_client
+        self.backend = backend
+
+        # Spark outputs of the last priced inputs, shared by call, put and Greeks accessors
+        self._outputs = None
+
+    def _spark_inputs(self):
+        """Returns inputs of the Spark BlackScholes service for this contract."""
+        return {
+            "ExercisePrice": self.K,
+            "RisklessRate": self.r,
+            "StdDev": self.sigma,
+            "StockPrice": self.S,
+            "TimeToExpiry": self.T
+        }
+
+    def _local_outputs(self):
+        """Returns outputs calculated with local closed-form backend, in the same format as Spark outputs."""
+        outputs = black_scholes(self.S, self.K, self.T, self.r, self.sigma)
+        return {key: float(value) for key, value in outputs.items()}
+
+    def _model_outputs(self):
+        """Returns call/put prices and Greeks from the selected backend."""
+        if self.backend == BACKEND.LOCAL.value:
+            return self._local_outputs()
+        return self._spark_outputs()
+
+    async def _model_outputs_async(self):
+        """Asynchronous version of _model_outputs (local backend is computed directly)."""
+        if self.backend == BACKEND.LOCAL.value:
+            return self._local_outputs()
+        return await self._spark_outputs_async()
+
+    def _cached_outputs(self, inputs):
+        """Returns Spark outputs already fetched for inputs (None if parameters have changed since)."""
+        if self._outputs is not None and self._outputs[0] == inputs:
+            return self._outputs[1]
+        return None
+
+    def _spark_outputs(self):
+        """
+        Returns full Spark BlackScholes outputs (callprice, putprice and Greeks) for current parameters.
+        Service is executed once per parameter set, concurrent identical requests are coalesced by the client.
+        """
+        from .spark import get_client
+        inputs = self._spark_inputs()
+        outputs = self._cached_outputs(inputs)
+        if outputs is None:
+            client = self.spark_client or get_client()
+            outputs = client.execute(self.SPARK_SERVICE, inputs, self.VERSION_ID)
+            self._outputs = (inputs, outputs)
+        return outputs
+
+    async def _spark_outputs_async(self):
+        """Asynchronous version of _spark_outputs."""
+        from .spark_async import get_async_client
+        inputs = self._spark_inputs()
+        outputs = self._cached_outputs(inputs)
+        if outputs is None:
+            client = self.async_spark_client or get_async_client()
+            outputs = await client.execute(self.SPARK_SERVICE, inputs, self.VERSION_ID)
+            self._outputs = (inputs, outputs)
+        return outputs
         
     def _calculate_call_option_price(self): 
         """
         Calculates price for call option according to the formula.        
         Formula: S*N(d1) - PresentValue(K)*N(d2)
         """
-
-        url = "https://excel.staging.coherent.global/coherent/api/v3/folders/Microsoft Envision/services/BlackScholes/Execute"
-
-        payload = json.dumps({
-          "request_data": {
-            "inputs": {
-              "ExercisePrice": self.K,
-              "RisklessRate": self.r,
-              "StdDev": self.sigma,
-              "StockPrice": self.S,
-              "TimeToExpiry": self.T
-            }
-          },
-          "request_meta": {
-            "version_id": "49294d02-b796-4966-8d2f-c76193ebad6b",
-            "call_purpose": "Spark - API Tester",
-            "source_system": "SPARK",
-            "correlation_id": "",
-            "requested_output": None,
-            "service_category": ""
-          }
-        })
-        headers = {
-          'Content-Type': 'application/json',
-          'x-tenant-name': 'coherent',
-          'x-synthetic-key': 'facaae76-30e7-4201-9cc7-683dd3a751c6'
-        }
-
-        response = requests.request("POST", url, headers=headers, data=payload)
-        
-        outputs = json.loads(response.text)['response_data']['outputs']
-        
-        return outputs
-    
+        return self._model_outputs()
 
     def _calculate_put_option_price(self): 
         """
         Calculates price for put option according to the formula.        
         Formula: PresentValue(K)*N(-d2) - S*N(-d1)
         """  
-        url = "https://excel.staging.coherent.global/coherent/api/v3/folders/Microsoft Envision/services/BlackScholes/Execute"
-
-        payload = json.dumps({
-          "request_data": {
-            "inputs": {
-              "ExercisePrice": self.K,
-              "RisklessRate": self.r,
-              "StdDev": self.sigma,
-              "StockPrice": self.S,
-              "TimeToExpiry": self.T
-            }
-          },
-          "request_meta": {
-            "version_id": "4ed3f377-ef3d-488a-b5bd-d2df160be49f",
-            "call_purpose": "Spark - API Tester",
-            "source_system": "SPARK",
-            "correlation_id": "",
-            "requested_output": None,
-            "service_category": ""
-          }
-        })
-        headers = {
-          'Content-Type': 'application/json',
-          'x-tenant-name': 'coherent',
-          'x-synthetic-key': 'facaae76-30e7-4201-9cc7-683dd3a751c6'
-        }
+        return self._model_outputs()['putprice']
 
-        response = requests.request("POST", url, headers=headers, data=payload)
-        
-        outputs = json.loads(response.text)['response_data']['outputs']   
-        
-        return outputs['putprice']
-        
+    async def _calculate_call_option_price_async(self):
+        """Asynchronous version of _calculate_call_option_price."""
+        return await self._model_outputs_async()
+
+    async def _calculate_put_option_price_async(self):
+        """Asynchronous version of _calculate_put_option_price."""
+        return (await self._model_outputs_async())['putprice']
 
     def _calculate_greeks(self): 
+        """Calculates option Greeks (Delta, Gamma, Theta, Vega, Rho) together with call and put prices."""
+        return self._model_outputs()
+
+    @classmethod
+    @metrics.instrumented
+    def price_batch(cls, contracts, max_workers=None, spark_client=None, backend=BACKEND.SPARK.value):
         """
-        Calculates price for put option according to the formula.        
-        Formula: PresentValue(K)*N(-d2) - S*N(-d1)
-        """  
-        url = "https://excel.staging.coherent.global/coherent/api/v3/folders/Microsoft Envision/services/BlackScholes/Execute"
-
-        payload = json.dumps({
-          "request_data": {
-            "inputs": {
-              "ExercisePrice": self.K,
-              "RisklessRate": self.r,
-              "StdDev": self.sigma,
-              "StockPrice": self.S,
-              "TimeToExpiry": self.T
-            }
-          },
-          "request_meta": {
-            "version_id": "4ed3f377-ef3d-488a-b5bd-d2df160be49f",
-            "call_purpose": "Spark - API Tester",
-            "source_system": "SPARK",
-            "correlation_id": "",
-            "requested_output": None,
-            "service_category": ""
-          }
-        })
-        headers = {
-          'Content-Type': 'application/json',
-          'x-tenant-name': 'coherent',
-          'x-synthetic-key': 'facaae76-30e7-4201-9cc7-683dd3a751c6'
-        }
+        Prices batch of contracts with concurrent requests over pooled Spark connections
+        (or in one vectorized pass with local backend).
+        Returns DataFrame aligned with contracts (same index) with call/put prices and Greeks.
 
-        response = requests.request("POST", url, headers=headers, data=payload)
-        
-        outputs = json.loads(response.text)['response_data']['outputs']   
-        
-        return outputs
+        Params:
+        contracts: DataFrame with columns S, K, T, r, sigma or array-like of such rows (T in years)
+        max_workers: number of requests in flight at once, defaults to Spark client pool size
+        spark_client: Spark client used for pricing requests (shared pooled client by default)
+        backend: 'spark' for pricing with Spark BlackScholes service, 'local' for closed-form NumPy calculation
+        """
+        import pandas as pd
+        contracts = contracts_frame(contracts)
+        if backend == BACKEND.LOCAL.value:
+            outputs = black_scholes(*[contracts[column].values for column in CONTRACT_COLUMNS])
+            return pd.DataFrame(outputs, index=contracts.index)[cls.OUTPUT_COLUMNS]
+
+        inputs_list = [
+            {"ExercisePrice": K, "RisklessRate": r, "StdDev": sigma, "StockPrice": S, "TimeToExpiry": T}
+            for S, K, T, r, sigma in contracts.itertuples(index=False, name=None)
+        ]
+        from .spark import get_client
+        client = spark_client or get_client()
+        outputs = client.execute_many(cls.SPARK_SERVICE, inputs_list, cls.VERSION_ID, max_workers=max_workers)
+        return pd.DataFrame(outputs, index=contracts.index).reindex(columns=cls.OUTPUT_COLUMNS)
@@ -1,11 +1,214 @@
+# Standard library imports
+import asyncio
+
 # Third party imports
-import requests
 import numpy as np
-from scipy.stats import norm 
-import json
 
 # Local package imports
-from .base import OptionPricingModel
+from .base import BACKEND, EXERCISE_STYLE, OptionPricingModel, resolve_sigma
+
+
+class _MomentAccumulator:
+    """
+    Accumulates means and co-moments of several sample columns chunk by chunk (Chan et al. parallel update),
+    so sample statistics of arbitrarily many draws are computed in constant memory.
+    """
+
+    def __init__(self, dimension):
+        self.n = 0
+        self.mean = np.zeros(dimension)
+        self.comoment = np.zeros((dimension, dimension))
+
+    def update(self, samples):
+        """Adds chunk of samples (array of shape (number_of_samples, dimension))."""
+        n_b = samples.shape[0]
+        mean_b = samples.mean(axis=0)
+        centered = samples - mean_b
+        comoment_b = centered.T @ centered
+
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.comoment += comoment_b + np.outer(delta, delta) * self.n * n_b / n
+        self.mean += delta * n_b / n
+        self.n = n
+
+    def covariance(self):
+        return self.comoment / (self.n - 1)
+
+
+# Greeks estimated from simulated terminal prices, in order of their sample columns for each option type
+GREEKS = ['Delta', 'Gamma', 'Vega', 'Rho']
+
+
+def _discounted_samples(S, K, T, r, sigma, Z, greeks):
+    """
+    Returns matrix of discounted per-draw estimates with columns: call payoff, put payoff, terminal price and,
+    if greeks is set, GREEKS of call followed by GREEKS of put.
+    Delta, Vega and Rho are pathwise derivatives of payoffs, Gamma is mixed likelihood ratio-pathwise estimator.
+    """
+    S_T = S * np.exp((r - 0.5 * sigma ** 2) * T + sigma * np.sqrt(T) * Z)
+    columns = [np.maximum(S_T - K, 0.0), np.maximum(K - S_T, 0.0), S_T]
+
+    if greeks:
+        call_exercised = S_T > K
+        put_exercised = ~call_exercised
+        dS_T_dS = S_T / S
+        dS_T_dsigma = S_T * (np.sqrt(T) * Z - sigma * T)
+        # Pathwise Delta differentiated once more with likelihood ratio of normal draw
+        gamma_weight = K * Z / (S ** 2 * sigma * np.sqrt(T))
+        for sign, exercised in ((1.0, call_exercised), (-1.0, put_exercised)):
+            indicator = sign * exercised
+            columns += [indicator * dS_T_dS, indicator * gamma_weight, indicator * dS_T_dsigma, indicator * K * T]
+
+    samples = np.column_stack(columns)
+    samples *= np.exp(-r * T)
+    return samples
+
+
+def monte_carlo_european(S, K, T, r, sigma, number_of_simulations, chunk_size=1_000_000, antithetic=True,
+                         control_variate=True, seed=None, greeks=False):
+    """
+    Prices European call and put by simulating terminal prices of geometric Brownian motion directly
+    (no intermediate time steps are needed for European payoffs). Draws are generated in chunks of chunk_size,
+    so memory usage doesn't depend on number_of_simulations.
+    Returns dictionary with CallPrice, PutPrice and their standard errors (CallStdError, PutStdError).
+    With greeks set, Delta, Gamma, Vega and Rho of both options are estimated from the same draws as prices
+    (e.g. CallDelta with CallDeltaStdError), instead of re-simulating bumped parameters.
+
+    Params:
+    S: underlying spot price
+    K: strike price
+    T: time to maturity in years
+    r: risk-free rate
+    sigma: volatility of the underlying asset
+    number_of_simulations: number of simulated terminal prices
+    chunk_size: number of terminal prices generated at once
+    antithetic: use antithetic variates (each normal draw Z is paired with -Z)
+    control_variate: use discounted terminal price (expected value S) as control variate for prices
+    seed: seed of the random generator
+    greeks: estimate Greeks together with prices
+    """
+    rng = np.random.default_rng(seed)
+
+    # Independent samples are single draws, or pairs (Z, -Z) averaged together with antithetic variates
+    draws_per_sample = 2 if antithetic else 1
+    number_of_samples = max(int(np.ceil(number_of_simulations / draws_per_sample)), 2)
+    samples_per_chunk = max(chunk_size // draws_per_sample, 1)
+
+    accumulator = _MomentAccumulator(3 + (2 * len(GREEKS) if greeks else 0))
+    remaining = number_of_samples
+    while remaining > 0:
+        m = min(samples_per_chunk, remaining)
+        Z = rng.standard_normal(m)
+
+        samples = _discounted_samples(S, K, T, r, sigma, Z, greeks)
+        if antithetic:
+            samples += _discounted_samples(S, K, T, r, sigma, -Z, greeks)
+            samples *= 0.5
+
+        accumulator.update(samples)
+        remaining -= m
+
+    n = accumulator.n
+    mean = accumulator.mean
+    covariance = accumulator.covariance()
+
+    outputs = {}
+    for name, column in (('Call', 0), ('Put', 1)):
+        price = mean[column]
+        variance = covariance[column, column]
+        if control_variate and covariance[2, 2] > 0:
+            # Optimal control variate coefficient, E[discounted S_T] = S under risk neutral measure
+            beta = covariance[column, 2] / covariance[2, 2]
+            price -= beta * (mean[2] - S)
+            variance -= covariance[column, 2] ** 2 / covariance[2, 2]
+        outputs[f'{name}Price'] = float(price)
+        outputs[f'{name}StdError'] = float(np.sqrt(max(variance, 0.0) / n))
+
+    if greeks:
+        for offset, name in ((3, 'Call'), (3 + len(GREEKS), 'Put')):
+            for i, greek in enumerate(GREEKS):
+                column = offset + i
+                outputs[f'{name}{greek}'] = float(mean[column])
+                outputs[f'{name}{greek}StdError'] = float(np.sqrt(covariance[column, column] / n))
+    return outputs
+
+
+def _regression_basis(x, basis, degree):
+    """Returns regression matrix of basis functions evaluated at moneyness values x."""
+    if callable(basis):
+        return basis(x)
+    if basis == 'laguerre':
+        # Weighted Laguerre polynomials used in Longstaff-Schwartz paper
+        return np.polynomial.laguerre.lagvander(x, degree) * np.exp(-0.5 * x)[:, None]
+    if basis == 'polynomial':
+        return np.polynomial.polynomial.polyvander(x, degree)
+    raise ValueError(f'Unknown regression basis: {basis}')
+
+
+def longstaff_schwartz(S, K, T, r, sigma, number_of_simulations, number_of_exercise_dates, basis='laguerre', degree=3,
+                       seed=None):
+    """
+    Prices American (Bermudan) call and put with least-squares Monte Carlo (Longstaff-Schwartz).
+    Paths are generated backwards in time with Brownian bridge, one time slice at a time, so only current prices and
+    cash flows of all paths are held in memory, never the full path matrix. At each exercise date continuation values
+    are estimated with one vectorized least-squares regression over in-the-money paths.
+    Returns dictionary with CallPrice, PutPrice and their standard errors (CallStdError, PutStdError).
+
+    Params:
+    S: underlying spot price
+    K: strike price
+    T: time to maturity in years
+    r: risk-free rate
+    sigma: volatility of the underlying asset
+    number_of_simulations: number of simulated paths
+    number_of_exercise_dates: number of equally spaced exercise dates (last one is expiry date)
+    basis: regression basis functions of moneyness S_t / K: 'laguerre', 'polynomial' or callable returning basis matrix
+    degree: degree of 'laguerre' or 'polynomial' basis
+    seed: seed of the random generator
+    """
+    rng = np.random.default_rng(seed)
+    M = number_of_exercise_dates
+    dt = T / M
+    drift = r - 0.5 * sigma ** 2
+    step_discount = np.exp(-r * dt)
+
+    # Brownian motion and prices at expiry
+    W = np.sqrt(T) * rng.standard_normal(number_of_simulations)
+    S_t = S * np.exp(drift * T + sigma * W)
+
+    # Cash flows of exercise strategy (call and put rows) valued at current time slice
+    cash_flows = np.empty((2, number_of_simulations))
+    np.maximum(S_t - K, 0.0, out=cash_flows[0])
+    np.maximum(K - S_t, 0.0, out=cash_flows[1])
+
+    for k in range(M - 1, 0, -1):
+        # Brownian bridge from t_(k+1) back to t_k, conditioned on W(0) = 0
+        t, t_next = k * dt, (k + 1) * dt
+        W *= t / t_next
+        W += np.sqrt(t * (t_next - t) / t_next) * rng.standard_normal(number_of_simulations)
+        np.exp(drift * t + sigma * W, out=S_t)
+        S_t *= S
+
+        cash_flows *= step_discount
+        for row, exercise_values in enumerate((S_t - K, K - S_t)):
+            in_the_money = np.flatnonzero(exercise_values > 0)
+            if in_the_money.size <= degree + 1:
+                continue
+            X = _regression_basis(S_t[in_the_money] / K, basis, degree)
+            coefficients = np.linalg.lstsq(X, cash_flows[row, in_the_money], rcond=None)[0]
+            continuation_values = X @ coefficients
+            exercised = in_the_money[exercise_values[in_the_money] > continuation_values]
+            cash_flows[row, exercised] = exercise_values[exercised]
+
+    cash_flows *= step_discount
+    outputs = {}
+    for name, row, intrinsic_value in (('Call', 0, max(S - K, 0.0)), ('Put', 1, max(K - S, 0.0))):
+        # Exercise at valuation date if intrinsic value is higher than expected value of holding
+        price = max(cash_flows[row].mean(), intrinsic_value)
+        outputs[f'{name}Price'] = float(price)
+        outputs[f'{name}StdError'] = float(cash_flows[row].std(ddof=1) / np.sqrt(number_of_simulations))
+    return outputs
 
 
 class MonteCarloPricing(OptionPricingModel):
@@ -16,7 +219,14 @@ class MonteCarloPricing(OptionPricingModel):
     That value represents option price
     """
 
-    def __init__(self, underlying_spot_price, strike_price, days_to_maturity, risk_free_rate, sigma, number_of_simulations):
+    SPARK_SERVICE = "MonteCarloSimulation"
+    VERSION_ID = "4d5274e8-9b0d-49f6-873e-536537b237be"
+    COMPILER_TYPE = "Type3"
+
+    def __init__(self, underlying_spot_price, strike_price, days_to_maturity, risk_free_rate, sigma, number_of_simulations,
+                 spark_client=None, async_spark_client=None, backend=BACKEND.SPARK.value, antithetic=True,
+                 control_variate=True, chunk_size=1_000_000, seed=None, exercise_style=EXERCISE_STYLE.EUROPEAN.value,
+                 number_of_exercise_dates=None, basis='laguerre', basis_degree=3):
         """
         Initializes variables used in Black-Scholes formula .
 
@@ -24,98 +234,127 @@ class MonteCarloPricing(OptionPricingModel):
         strike_price: strike price for option cotract
         days_to_maturity: option contract maturity/exercise date
         risk_free_rate: returns on risk-free assets (assumed to be constant until expiry date)
-        sigma: volatility of the underlying asset (standard deviation of asset's log returns)
+        sigma: volatility of the underlying asset (standard deviation of asset's log returns) or volatility surface
         number_of_simulations: number of potential random underlying price movements 
+        spark_client: Spark client used for pricing requests (shared pooled client by default)
+        async_spark_client: asynchronous Spark client used by *_async methods (shared client by default)
+        backend: 'spark' for simulation in Spark MonteCarloSimulation service, 'local' for simulation with NumPy
+        antithetic: use antithetic variates in local simulation
+        control_variate: use terminal price as control variate in local simulation
+        chunk_size: number of terminal prices generated at once in local simulation (bounds memory usage)
+        seed: seed of the random generator used in local simulation
+        exercise_style: 'european', or 'american' for early exercise priced with Longstaff-Schwartz (local backend only)
+        number_of_exercise_dates: number of equally spaced exercise dates for American options, defaults to days to maturity
+        basis: regression basis of Longstaff-Schwartz: 'laguerre', 'polynomial' or callable returning basis matrix
+        basis_degree: degree of regression basis polynomials
         """
         # Parameters for Brownian process
         self.S_0 = underlying_spot_price
         self.K = strike_price
         self.T = days_to_maturity / 365
         self.r = risk_free_rate
-        self.sigma = sigma 
+        self.sigma = resolve_sigma(sigma, self.K, self.T)
 
         # Parameters for simulation
         self.N = number_of_simulations
         self.num_of_steps = days_to_maturity
         self.dt = self.T / self.num_of_steps
 
+        self.spark_client = spark_client
+        self.async_spark_client = async_spark_client
+        self.backend = backend
+
+        # Parameters for local simulation
+        self.antithetic = antithetic
+        self.control_variate = control_variate
+        self.chunk_size = chunk_size
+        self.seed = seed
+
+        # Parameters for early exercise
+        self.exercise_style = exercise_style
+        self.number_of_exercise_dates = number_of_exercise_dates or self.num_of_steps
+        self.basis = basis
+        self.basis_degree = basis_degree
+
+    def _spark_inputs(self):
+        """Returns inputs of the Spark MonteCarloSimulation service for this contract."""
+        return {
+            "daystoexpire": self.num_of_steps,
+            "numSimulations": self.N,
+            "historicvolatility": self.sigma,
+            "price": self.S_0,
+            "riskfreerate": self.r,
+            "strikeprice": self.K
+        }
+
+    def _execute(self):
+        """Executes Spark MonteCarloSimulation service through pooled client and returns its outputs."""
+        from .spark import get_client
+        client = self.spark_client or get_client()
+        return client.execute(self.SPARK_SERVICE, self._spark_inputs(), self.VERSION_ID, compiler_type=self.COMPILER_TYPE)
+
+    async def _execute_async(self):
+        """Executes Spark MonteCarloSimulation service through asynchronous client and returns its outputs."""
+        from .spark_async import get_async_client
+        client = self.async_spark_client or get_async_client()
+        return await client.execute(self.SPARK_SERVICE, self._spark_inputs(), self.VERSION_ID, compiler_type=self.COMPILER_TYPE)
+
+    def _simulate(self):
+        """Runs local simulation and returns call/put prices with their standard errors."""
+        if self.exercise_style == EXERCISE_STYLE.AMERICAN.value:
+            return longstaff_schwartz(self.S_0, self.K, self.T, self.r, self.sigma, self.N, self.number_of_exercise_dates,
+                                      basis=self.basis, degree=self.basis_degree, seed=self.seed)
+        return monte_carlo_european(self.S_0, self.K, self.T, self.r, self.sigma, self.N, chunk_size=self.chunk_size,
+                                    antithetic=self.antithetic, control_variate=self.control_variate, seed=self.seed)
+
+    def _calculate_greeks(self):
+        """
+        Calculates call/put prices together with Delta, Gamma, Vega and Rho (and their standard errors)
+        from one local simulation of European option.
+        """
+        if self.backend != BACKEND.LOCAL.value or self.exercise_style != EXERCISE_STYLE.EUROPEAN.value:
+            raise ValueError('Monte Carlo Greeks are supported only for European options with local backend')
+        return monte_carlo_european(self.S_0, self.K, self.T, self.r, self.sigma, self.N, chunk_size=self.chunk_size,
+                                    antithetic=self.antithetic, control_variate=self.control_variate, seed=self.seed,
+                                    greeks=True)
+
+    def _check_spark_exercise_style(self):
+        """Spark MonteCarloSimulation service prices only European options."""
+        if self.exercise_style != EXERCISE_STYLE.EUROPEAN.value:
+            raise ValueError(f"Exercise style '{self.exercise_style}' is supported only by local backend")
+
+    def _model_outputs(self):
+        """Returns simulation outputs from the selected backend."""
+        if self.backend == BACKEND.LOCAL.value:
+            return self._simulate()
+        self._check_spark_exercise_style()
+        return self._execute()
+
+    async def _model_outputs_async(self):
+        """Asynchronous version of _model_outputs (local simulation is run in thread pool)."""
+        if self.backend == BACKEND.LOCAL.value:
+            return await asyncio.get_running_loop().run_in_executor(None, self._simulate)
+        self._check_spark_exercise_style()
+        return await self._execute_async()
 
     def _calculate_call_option_price(self): 
         """
         Call option price calculation. Calculating payoffs for simulated prices at expiry date, summing up, averiging them and discounting.   
         Call option payoff (it's exercised only if the price at expiry date is higher than a strike price): max(S_t - K, 0)
         """
-
-        url = "https://excel.staging.coherent.global/coherent/api/v3/folders/Microsoft Envision/services/MonteCarloSimulation/Execute"
-
-        payload = json.dumps({
-          "request_data": {
-            "inputs": {
-              "daystoexpire": self.num_of_steps,
-              "numSimulations": self.N,
-              "historicvolatility": self.sigma,
-              "price": self.S_0,
-              "riskfreerate": self.r,
-              "strikeprice": self.K
-            }
-          },
-          "request_meta": {
-            "version_id": "4d5274e8-9b0d-49f6-873e-536537b237be",
-            "call_purpose": "Spark - API Tester",
-            "source_system": "SPARK",
-            "correlation_id": "",
-            "requested_output": None,
-            "service_category": "",
-            "compiler_type": "Type3"
-          }
-        })
-        headers = {
-          'Content-Type': 'application/json',
-          'x-tenant-name': 'coherent',
-          'x-synthetic-key': 'facaae76-30e7-4201-9cc7-683dd3a751c6'
-        }
-
-        response = requests.request("POST", url, headers=headers, data=payload)
-        outputs = json.loads(response.text)['response_data']['outputs']
-        
-        return outputs
+        return self._model_outputs()
 
     def _calculate_put_option_price(self): 
         """
         Put option price calculation. Calculating payoffs for simulated prices at expiry date, summing up, averiging them and discounting.   
         Put option payoff (it's exercised only if the price at expiry date is lower than a strike price): max(K - S_t, 0)
         """
-        
-        url = "https://excel.staging.coherent.global/coherent/api/v3/folders/Microsoft Envision/services/MonteCarloSimulation/Execute"
-
-        payload = json.dumps({
-          "request_data": {
-            "inputs": {
-              "daystoexpire": self.num_of_steps,
-              "historicvolatility": self.sigma,
-              "numSimulations": self.N,
-              "price": self.S_0,
-              "riskfreerate": self.r,
-              "strikeprice": self.K
-            }
-          },
-          "request_meta": {
-            "version_id": "4d5274e8-9b0d-49f6-873e-536537b237be",
-            "call_purpose": "Spark - API Tester",
-            "source_system": "SPARK",
-            "correlation_id": "",
-            "requested_output": None,
-            "service_category": "",
-            "compiler_type": "Type3"
-          }
-        })
-        headers = {
-          'Content-Type': 'application/json',
-          'x-tenant-name': 'coherent',
-          'x-synthetic-key': 'facaae76-30e7-4201-9cc7-683dd3a751c6'
-        }
+        return self._model_outputs()
+
+    async def _calculate_call_option_price_async(self):
+        """Asynchronous version of _calculate_call_option_price."""
+        return await self._model_outputs_async()
 
-        response = requests.request("POST", url, headers=headers, data=payload)
-        outputs = json.loads(response.text)['response_data']['outputs']
-        
-        return outputs
+    async def _calculate_put_option_price_async(self):
+        """Asynchronous version of _calculate_put_option_price."""
+        return await self._model_outputs_async()
@@ -1,4 +1,42 @@
-from .BlackScholesModel import BlackScholesModel
-from .MonteCarloSimulation import MonteCarloPricing
-from .BinomialTreeModel import BinomialTreeModel
-from .ticker import Ticker
\ No newline at end of file
+# Public names are imported on first access (PEP 562 module __getattr__), so importing the package or one model
+# doesn't pull in dependencies of the others (scipy, pandas, requests, matplotlib, pandas_datareader...).
+_EXPORTS = {
+    'BlackScholesModel': '.BlackScholesModel',
+    'MonteCarloPricing': '.MonteCarloSimulation',
+    'BinomialTreeModel': '.BinomialTreeModel',
+    'Ticker': '.ticker',
+    'SparkClient': '.spark',
+    'configure_client': '.spark',
+    'get_client': '.spark',
+    'ResponseCache': '.cache',
+    'implied_volatility': '.implied_volatility',
+    'VolSurface': '.volatility_surface',
+    'PriceStore': '.price_store',
+    'historical_volatility': '.historical_volatility',
+    'RollingVolatility': '.historical_volatility',
+    'DirectoryProvider': '.market_data',
+    'InMemoryProvider': '.market_data',
+    'YahooProvider': '.market_data',
+    'configure_provider': '.market_data',
+    'get_provider': '.market_data',
+    'price_portfolio': '.portfolio',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    try:
+        module_name = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}') from None
+
+    from importlib import import_module
+    value = getattr(import_module(module_name, __name__), name)
+    # Cached in module namespace, so __getattr__ runs once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,13 +1,32 @@
+import asyncio
 from enum import Enum
 from abc import ABC, abstractclassmethod
 
+# Third party imports
+import numpy as np
+
+# Local package imports
+from . import metrics
+
+# Contract parameters used by batch pricing: spot, strike, time to maturity (years), risk-free rate, volatility
+CONTRACT_COLUMNS = ['S', 'K', 'T', 'r', 'sigma']
+
 class OPTION_TYPE(Enum):
     CALL_OPTION = 'Call Option'
     PUT_OPTION = 'Put Option'
 
+class EXERCISE_STYLE(Enum):
+    EUROPEAN = 'european'
+    AMERICAN = 'american'
+
+class BACKEND(Enum):
+    SPARK = 'spark'
+    LOCAL = 'local'
+
 class OptionPricingModel(ABC):
     """Abstract class defining interface for option pricing models."""
 
+    @metrics.instrumented
     def calculate_option_price(self, option_type):
         """Calculates call/put option price according to the specified parameter."""
         if option_type == OPTION_TYPE.CALL_OPTION.value:
@@ -17,6 +36,24 @@ class OptionPricingModel(ABC):
         else:
             return -1
 
+    @metrics.instrumented
+    async def calculate_option_price_async(self, option_type):
+        """Calculates call/put option price according to the specified parameter without blocking the event loop."""
+        if option_type == OPTION_TYPE.CALL_OPTION.value:
+            return await self._calculate_call_option_price_async()
+        elif option_type == OPTION_TYPE.PUT_OPTION.value:
+            return await self._calculate_put_option_price_async()
+        else:
+            return -1
+
+    async def _calculate_call_option_price_async(self):
+        """Calculates option price for call option. Models without asynchronous backend are run in thread pool."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._calculate_call_option_price)
+
+    async def _calculate_put_option_price_async(self):
+        """Calculates option price for put option. Models without asynchronous backend are run in thread pool."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._calculate_put_option_price)
+
     @abstractclassmethod
     def _calculate_call_option_price(self):
         """Calculates option price for call option."""
@@ -25,4 +62,37 @@ class OptionPricingModel(ABC):
     @abstractclassmethod
     def _calculate_put_option_price(self):
         """Calculates option price for put option."""
-        pass
\ No newline at end of file
+        pass
+
+
+def contracts_frame(contracts):
+    """
+    Normalizes batch of contracts into DataFrame with CONTRACT_COLUMNS.
+
+    Params:
+    contracts: DataFrame containing CONTRACT_COLUMNS or array-like of (S, K, T, r, sigma) rows
+    """
+    import pandas as pd
+    if isinstance(contracts, pd.DataFrame):
+        missing = [column for column in CONTRACT_COLUMNS if column not in contracts.columns]
+        if missing:
+            raise ValueError(f'Contracts are missing columns: {missing}')
+        return contracts[CONTRACT_COLUMNS].astype(float)
+
+    values = np.asarray(contracts, dtype=float)
+    if values.ndim != 2 or values.shape[1] != len(CONTRACT_COLUMNS):
+        raise ValueError(f'Contracts must have shape (n, {len(CONTRACT_COLUMNS)}), got {values.shape}')
+    return pd.DataFrame(values, columns=CONTRACT_COLUMNS)
+
+
+def resolve_sigma(sigma, strike_price, T):
+    """
+    Returns volatility of contract: sigma itself, or value looked up in volatility surface if sigma is one
+    (any callable sigma(K, T), e.g. VolSurface).
+
+    Params:
+    sigma: volatility or volatility surface
+    strike_price: strike price for option contract
+    T: time to maturity in years
+    """
+    return sigma(strike_price, T) if callable(sigma) else sigma
@@ -0,0 +1,140 @@
+# Standard library imports
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Third party imports
+import numpy as np
+
+# Local package imports
+from . import metrics
+
+
+def _canonical(value):
+    """Converts value into canonical JSON-compatible form (sorted keys, all numbers as floats)."""
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    return value
+
+
+def payload_key(service, payload):
+    """
+    Returns content hash identifying Spark request: same service, version_id and inputs give same key
+    regardless of dictionary ordering or int/float representation of numbers.
+
+    Params:
+    service: name of the Spark service
+    payload: request body built by SparkClient.build_payload
+    """
+    canonical = json.dumps({'service': service, 'payload': _canonical(payload)}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Class implementing two-tier cache of Spark responses keyed by payload_key.
+    First tier is in-process LRU dictionary, second (optional) tier is sqlite database shared between processes and restarts.
+    Entries older than ttl seconds are treated as missing in both tiers.
+    """
+
+    def __init__(self, maxsize=1024, sqlite_path=None, ttl=None):
+        """
+        Initializes cache tiers.
+
+        Params:
+        maxsize: maximum number of responses kept in in-process LRU tier
+        sqlite_path: path of sqlite database used as on-disk tier, disabled if None
+        ttl: number of seconds responses stay valid, never expire if None
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sqlite_path = sqlite_path
+
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if sqlite_path is not None:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, created REAL)')
+            self._db.commit()
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key):
+        """Returns cached response for key or None if it's not cached (or expired)."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    metrics.increment(metrics.CACHE_LOOKUPS, result='memory_hit')
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute('SELECT value, created FROM responses WHERE key = ?', (key,)).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    value = json.loads(row[0])
+                    self._set_memory(key, value, row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    metrics.increment(metrics.CACHE_LOOKUPS, result='disk_hit')
+                    return value
+
+            self.misses += 1
+            metrics.increment(metrics.CACHE_LOOKUPS, result='miss')
+            return None
+
+    def set(self, key, value):
+        """Stores response under key in all enabled tiers."""
+        created = time.time()
+        with self._lock:
+            self._set_memory(key, value, created)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)', (key, json.dumps(value), created))
+                self._db.commit()
+
+    def _set_memory(self, key, value, created):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """Removes all entries from both tiers and resets counters."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM responses')
+                self._db.commit()
+            self.hits = self.memory_hits = self.disk_hits = self.misses = 0
+
+    def stats(self):
+        """Returns dictionary with hit/miss counters and hit rate."""
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'size': len(self._memory)
+        }
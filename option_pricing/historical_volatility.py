@@ -0,0 +1,208 @@
+# Standard library imports
+import math
+from enum import Enum
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Number of trading days used for annualizing daily volatilities
+TRADING_DAYS = 252
+
+# RiskMetrics decay factor of EWMA estimator
+EWMA_DECAY = 0.94
+
+
+class ESTIMATOR(Enum):
+    CLOSE_TO_CLOSE = 'close_to_close'
+    PARKINSON = 'parkinson'
+    GARMAN_KLASS = 'garman_klass'
+    YANG_ZHANG = 'yang_zhang'
+    EWMA = 'ewma'
+
+
+def _ohlc(data, close_column='Close'):
+    """
+    Splits fetched data into open, high, low and close frames with one column per ticker.
+    Accepts frame of single ticker (as returned by Ticker.get_historical_data) or frame with
+    (ticker, column name) columns (as returned by Ticker.get_historical_data_many).
+    """
+    columns = ['Open', 'High', 'Low', close_column]
+    if isinstance(data.columns, pd.MultiIndex):
+        return [data.xs(column, axis='columns', level=-1).astype(float) for column in columns]
+    return [data[[column]].astype(float).set_axis(['value'], axis='columns') for column in columns]
+
+
+def _bar_terms(estimator, open_, high, low, close, previous_close):
+    """
+    Returns list of per-bar terms whose window sums determine variance of estimator.
+    Works on numpy arrays (one bar of many tickers) as well as on frames (all bars of many tickers).
+    """
+    if estimator == ESTIMATOR.CLOSE_TO_CLOSE:
+        r = np.log(close / previous_close)
+        return [r, r ** 2]
+    if estimator == ESTIMATOR.PARKINSON:
+        return [np.log(high / low) ** 2 / (4 * math.log(2))]
+    if estimator == ESTIMATOR.GARMAN_KLASS:
+        return [0.5 * np.log(high / low) ** 2 - (2 * math.log(2) - 1) * np.log(close / open_) ** 2]
+    if estimator == ESTIMATOR.YANG_ZHANG:
+        overnight = np.log(open_ / previous_close)
+        open_to_close = np.log(close / open_)
+        rogers_satchell = np.log(high / close) * np.log(high / open_) + np.log(low / close) * np.log(low / open_)
+        return [overnight, overnight ** 2, open_to_close, open_to_close ** 2, rogers_satchell]
+    raise ValueError(f'Unknown rolling volatility estimator: {estimator}')
+
+
+def _sample_variance(total, total_of_squares, n):
+    return (total_of_squares - total ** 2 / n) / (n - 1)
+
+
+def _daily_variance(estimator, sums, n):
+    """Combines window sums of per-bar terms (see _bar_terms) over n bars into daily variance."""
+    if estimator == ESTIMATOR.CLOSE_TO_CLOSE:
+        return _sample_variance(sums[0], sums[1], n)
+    if estimator in (ESTIMATOR.PARKINSON, ESTIMATOR.GARMAN_KLASS):
+        return sums[0] / n
+    # Yang-Zhang: overnight and open-to-close variances mixed with Rogers-Satchell term, k minimizes estimator variance
+    k = 0.34 / (1.34 + (n + 1) / (n - 1))
+    overnight = _sample_variance(sums[0], sums[1], n)
+    open_to_close = _sample_variance(sums[2], sums[3], n)
+    return overnight + k * open_to_close + (1 - k) * sums[4] / n
+
+
+def _annualize(variance, trading_days):
+    return np.sqrt(np.maximum(variance, 0.0) * trading_days)
+
+
+def historical_volatility(data, estimator=ESTIMATOR.YANG_ZHANG.value, window=21, decay=EWMA_DECAY,
+                          trading_days=TRADING_DAYS, close_column='Close'):
+    """
+    Calculates rolling annualized historical volatility for all tickers of fetched data at once.
+    Returns frame of volatilities indexed by date with one column per ticker (series for single ticker data);
+    last row holds current volatilities, which can be passed directly as sigma parameter of pricing models.
+
+    Params:
+    data: OHLC data of one ticker (Ticker.get_historical_data) or many tickers (Ticker.get_historical_data_many)
+    estimator: 'close_to_close', 'parkinson', 'garman_klass', 'yang_zhang' or 'ewma'
+    window: number of bars in rolling window (ignored by EWMA estimator)
+    decay: decay factor of EWMA estimator
+    trading_days: number of bars per year used for annualizing
+    close_column: column holding close prices
+    """
+    estimator = ESTIMATOR(estimator)
+    open_, high, low, close = _ohlc(data, close_column)
+    previous_close = close.shift(1)
+
+    if estimator == ESTIMATOR.EWMA:
+        r = np.log(close / previous_close)
+        # Seeded with first squared return, as in RiskMetrics recursion
+        variance = (r ** 2).ewm(alpha=1 - decay, adjust=False).mean()
+    else:
+        if window < 2:
+            raise ValueError(f'Rolling window must have at least 2 bars, got {window}')
+        terms = _bar_terms(estimator, open_, high, low, close, previous_close)
+        sums = [term.rolling(window).sum() for term in terms]
+        variance = _daily_variance(estimator, sums, window)
+
+    volatility = _annualize(variance, trading_days)
+    if not isinstance(data.columns, pd.MultiIndex):
+        return volatility['value'].rename(estimator.value)
+    return volatility
+
+
+class RollingVolatility:
+    """
+    Class keeping rolling historical volatility of many tickers up to date bar by bar.
+    Per-bar terms of the last window bars are held in ring buffer together with their running sums,
+    so every new bar costs constant work per ticker instead of recomputing the whole window.
+    """
+
+    def __init__(self, tickers, estimator=ESTIMATOR.YANG_ZHANG.value, window=21, decay=EWMA_DECAY,
+                 trading_days=TRADING_DAYS):
+        """
+        Initializes empty state (volatilities are NaN until window bars are seen, see also from_history).
+
+        Params:
+        tickers: list of ticker symbols
+        estimator: 'close_to_close', 'parkinson', 'garman_klass', 'yang_zhang' or 'ewma'
+        window: number of bars in rolling window (ignored by EWMA estimator)
+        decay: decay factor of EWMA estimator
+        trading_days: number of bars per year used for annualizing
+        """
+        self.tickers = list(tickers)
+        self.estimator = ESTIMATOR(estimator)
+        self.window = window
+        self.decay = decay
+        self.trading_days = trading_days
+        if self.estimator != ESTIMATOR.EWMA and window < 2:
+            raise ValueError(f'Rolling window must have at least 2 bars, got {window}')
+
+        size = len(self.tickers)
+        self.previous_close = np.full(size, np.nan)
+        self.count = 0
+        if self.estimator == ESTIMATOR.EWMA:
+            self.variance = np.full(size, np.nan)
+        else:
+            # Ring buffer of per-bar terms: (window, number of terms, number of tickers)
+            number_of_terms = len(_bar_terms(self.estimator, *np.ones((5, size))))
+            self.terms = np.zeros((window, number_of_terms, size))
+            self.sums = np.zeros((number_of_terms, size))
+
+    @classmethod
+    def from_history(cls, data, estimator=ESTIMATOR.YANG_ZHANG.value, window=21, decay=EWMA_DECAY,
+                     trading_days=TRADING_DAYS, close_column='Close'):
+        """
+        Creates state from already fetched data by feeding its bars one by one.
+
+        Params:
+        data: OHLC data of many tickers (Ticker.get_historical_data_many) or one ticker
+        estimator, window, decay, trading_days: see RollingVolatility.__init__
+        close_column: column holding close prices
+        """
+        open_, high, low, close = _ohlc(data, close_column)
+        volatility = cls(close.columns, estimator, window, decay, trading_days)
+        for bar in zip(open_.to_numpy(), high.to_numpy(), low.to_numpy(), close.to_numpy()):
+            volatility.update(*bar)
+        return volatility
+
+    def update(self, open_, high, low, close):
+        """
+        Adds new bar of all tickers and returns array of current annualized volatilities.
+
+        Params:
+        open_, high, low, close: arrays of bar prices in order of tickers
+        """
+        open_, high, low, close = [np.asarray(x, dtype=float) for x in (open_, high, low, close)]
+        previous_close, self.previous_close = self.previous_close, close
+
+        if self.estimator == ESTIMATOR.EWMA:
+            squared_return = np.log(close / previous_close) ** 2
+            self.variance = np.where(np.isnan(self.variance), squared_return,
+                                     self.decay * self.variance + (1 - self.decay) * squared_return)
+            self.count += 1
+            return self.sigma
+
+        terms = np.array(_bar_terms(self.estimator, open_, high, low, close, previous_close))
+        slot = self.count % self.window
+        leaving_nan = np.isnan(self.terms[slot]).any()
+        self.sums += terms - self.terms[slot]
+        self.terms[slot] = terms
+        self.count += 1
+        # Running sums drift with floating point error (and stay NaN after missing bar leaves the window),
+        # so they're rebuilt once per window and whenever missing bar leaves it
+        if slot == self.window - 1 or leaving_nan:
+            self.sums = self.terms.sum(axis=0)
+        return self.sigma
+
+    @property
+    def sigma(self):
+        """Array of current annualized volatilities in order of tickers (NaN until window is filled)."""
+        if self.estimator == ESTIMATOR.EWMA:
+            return _annualize(self.variance, self.trading_days)
+        if self.count < self.window:
+            return np.full(len(self.tickers), np.nan)
+        return _annualize(_daily_variance(self.estimator, self.sums, self.window), self.trading_days)
+
+    def to_series(self):
+        """Returns current annualized volatilities as series indexed by ticker."""
+        return pd.Series(self.sigma, index=self.tickers)
@@ -0,0 +1,113 @@
+# Standard library imports
+import math
+
+# Third party imports
+import numpy as np
+
+# Local package imports
+from .base import OPTION_TYPE
+from .BlackScholesModel import black_scholes
+
+# Volatility bracket searched by the solver
+MIN_SIGMA = 1e-6
+MAX_SIGMA = 10.0
+
+
+def _initial_guess(call_price, S, discounted_K, T):
+    """Corrado-Miller rational approximation of implied volatility (falls back to 20% where it's not defined)."""
+    half_moneyness = 0.5 * (S - discounted_K)
+    excess = call_price - half_moneyness
+    root = np.sqrt(np.maximum(excess ** 2 - (S - discounted_K) ** 2 / np.pi, 0.0))
+    sigma = np.sqrt(2 * np.pi / T) / (S + discounted_K) * (excess + root)
+    return np.where(np.isfinite(sigma) & (sigma > MIN_SIGMA), np.clip(sigma, MIN_SIGMA, MAX_SIGMA), 0.2)
+
+
+def _call_price(S, K, T, r, sigma):
+    """Scalar Black-Scholes call price, used by Brent fallback where per-call overhead of arrays would dominate."""
+    vol = sigma * math.sqrt(T)
+    d1 = (math.log(S / K) + (r + 0.5 * sigma ** 2) * T) / vol
+    d2 = d1 - vol
+    return S * 0.5 * math.erfc(-d1 / math.sqrt(2)) - K * math.exp(-r * T) * 0.5 * math.erfc(-d2 / math.sqrt(2))
+
+
+def implied_volatility(price, S, K, T, r, option_type=OPTION_TYPE.CALL_OPTION.value, tolerance=1e-8, sigma_tolerance=1e-8,
+                       max_iterations=60):
+    """
+    Inverts Black-Scholes prices into implied volatilities for whole arrays of quotes at once.
+    All quotes are iterated together with safeguarded Newton method: each quote keeps bracket of volatilities,
+    and Newton steps leaving the bracket (or with vanishing vega) are replaced by bisection. Quotes that haven't
+    converged after max_iterations are solved one by one with Brent's method.
+    Returns array of implied volatilities, NaN for quotes outside no-arbitrage bounds or without solution.
+
+    Params:
+    price: market option prices
+    S: underlying spot price
+    K: strike price
+    T: time to maturity in years
+    r: risk-free rate
+    option_type: 'Call Option' or 'Put Option' (scalar or array)
+    tolerance: absolute price tolerance
+    sigma_tolerance: volatility tolerance (quotes with tiny vega converge once their volatility bracket is this narrow)
+    max_iterations: maximum number of vectorized Newton iterations
+    """
+    is_call = np.asarray(option_type) == OPTION_TYPE.CALL_OPTION.value
+    price, S, K, T, r, is_call = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (price, S, K, T, r)], is_call)
+    shape = price.shape
+    price, S, K, T, r, is_call = [x.ravel() for x in (price, S, K, T, r, is_call)]
+
+    # Puts are converted to calls with put-call parity, so only call prices are inverted
+    discounted_K = K * np.exp(-r * T)
+    call_price = np.where(is_call, price, price + S - discounted_K)
+
+    # No-arbitrage bounds of call price: max(S - PV(K), 0) < C < S
+    valid = (call_price > np.maximum(S - discounted_K, 0.0)) & (call_price < S) & (T > 0)
+    sigma = np.full(price.size, np.nan)
+    index = np.flatnonzero(valid)
+    if index.size == 0:
+        return sigma.reshape(shape)[()]
+
+    target, S_v, K_v, T_v, r_v = call_price[index], S[index], K[index], T[index], r[index]
+    low = np.full(index.size, MIN_SIGMA)
+    high = np.full(index.size, MAX_SIGMA)
+    estimate = _initial_guess(target, S_v, discounted_K[index], T_v)
+    converged = np.zeros(index.size, dtype=bool)
+
+    for _ in range(max_iterations):
+        active = np.flatnonzero(~converged)
+        if active.size == 0:
+            break
+        outputs = black_scholes(S_v[active], K_v[active], T_v[active], r_v[active], estimate[active])
+        difference = outputs['callprice'] - target[active]
+        vega = outputs['Vega']
+
+        # Call price increases with volatility, so sign of difference narrows the bracket
+        too_high = difference > 0
+        high[active] = np.where(too_high, estimate[active], high[active])
+        low[active] = np.where(too_high, low[active], estimate[active])
+
+        # Price tolerance alone isn't enough where vega is tiny, there volatility itself must be pinned down
+        price_converged = (np.abs(difference) < tolerance) & (np.abs(difference) < sigma_tolerance * vega)
+        converged[active[price_converged | (high[active] - low[active] < sigma_tolerance)]] = True
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = estimate[active] - difference / vega
+        bisection = 0.5 * (low[active] + high[active])
+        safe = np.isfinite(newton) & (newton > low[active]) & (newton < high[active])
+        step = np.where(safe, newton, bisection)
+        estimate[active] = np.where(converged[active], estimate[active], step)
+
+    # Brent fallback for quotes Newton iterations couldn't solve
+    unsolved = np.flatnonzero(~converged)
+    if unsolved.size:
+        from scipy.optimize import brentq
+    for i in unsolved:
+        objective = lambda s: _call_price(S_v[i], K_v[i], T_v[i], r_v[i], s) - target[i]
+        try:
+            estimate[i] = brentq(objective, low[i], high[i], xtol=sigma_tolerance)
+            converged[i] = True
+        except (ValueError, RuntimeError):
+            # No sign change in bracket (ValueError) or no convergence within iteration limit (RuntimeError)
+            converged[i] = False
+
+    sigma[index] = np.where(converged, estimate, np.nan)
+    return sigma.reshape(shape)[()]
@@ -0,0 +1,190 @@
+# Standard library imports
+import os
+import datetime
+import threading
+from abc import ABC, abstractmethod
+
+# Third party imports
+import pandas as pd
+
+
+SESSION_HEADERS = {'User-Agent': 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:89.0) Gecko/20100101 Firefox/89.0', 'Accept': 'application/json;charset=utf-8'}  # noqa
+
+# Maximum number of keep-alive connections per host held by shared sessions
+SESSION_POOL_SIZE = 16
+
+# Environment variables selecting default provider: OPTION_PRICING_DATA_PROVIDER is 'yahoo', 'directory' or 'memory',
+# OPTION_PRICING_DATA_DIR is the directory read by directory provider (setting it alone selects directory provider)
+PROVIDER_ENV = 'OPTION_PRICING_DATA_PROVIDER'
+DATA_DIR_ENV = 'OPTION_PRICING_DATA_DIR'
+
+# Shared sessions keyed by number of cache days (None for session without cache)
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(cache_data=True, cache_days=1):
+    """
+    Returns shared pooled session for fetching data, created on first use.
+    Cached sessions store responses in sqlite db and are shared by all requests with the same cache_days.
+
+    Params:
+    cache_data: flag for caching fetched data into sqlite db
+    cache_days: number of days data will stay in cache
+    """
+    key = cache_days if cache_data else None
+    session = _sessions.get(key)
+    if session is None:
+        import requests
+        import requests_cache
+        from requests.adapters import HTTPAdapter
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                if cache_data:
+                    # initializing sqlite for caching yahoo finance requests
+                    expire_after = datetime.timedelta(days=cache_days)
+                    session = requests_cache.CachedSession(cache_name='cache', backend='sqlite', expire_after=expire_after)
+                else:
+                    session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=SESSION_POOL_SIZE, pool_maxsize=SESSION_POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                # Adding headers to session
+                session.headers.update(SESSION_HEADERS)
+                _sessions[key] = session
+    return session
+
+
+def _date_range(data, start_date, end_date):
+    """Returns bars of data between start_date and end_date (both inclusive, open ended if None)."""
+    data = data.sort_index()
+    return data.loc[start_date:end_date] if start_date is not None or end_date is not None else data
+
+
+class MarketDataProvider(ABC):
+    """Abstract class defining interface for sources of historical stock data used by Ticker."""
+
+    @abstractmethod
+    def get_historical_data(self, ticker, start_date=None, end_date=None, cache_data=True, cache_days=1):
+        """
+        Returns dataframe of daily bars (Open, High, Low, Close, Volume, Adj Close) indexed by date.
+        Caching parameters apply only to providers fetching data over network.
+        """
+        pass
+
+
+class YahooProvider(MarketDataProvider):
+    """Provider fetching data from yahoo finance over shared pooled session (see get_session)."""
+
+    def get_historical_data(self, ticker, start_date=None, end_date=None, cache_data=True, cache_days=1):
+        from pandas_datareader import data as wb
+        session = get_session(cache_data, cache_days)
+        return wb.DataReader(ticker, data_source='yahoo', start=start_date, end=end_date, session=session)
+
+
+class DirectoryProvider(MarketDataProvider):
+    """
+    Provider reading data from local directory holding one file per ticker: <TICKER>.csv or <TICKER>.parquet
+    (e.g. files saved with DataFrame.to_csv from previously fetched data). Needs no network access.
+    """
+
+    def __init__(self, directory):
+        """
+        Params:
+        directory: path of the directory holding data files
+        """
+        self.directory = directory
+
+    def get_historical_data(self, ticker, start_date=None, end_date=None, cache_data=True, cache_days=1):
+        path = os.path.join(self.directory, ticker.upper())
+        if os.path.exists(f'{path}.parquet'):
+            data = pd.read_parquet(f'{path}.parquet')
+        elif os.path.exists(f'{path}.csv'):
+            data = pd.read_csv(f'{path}.csv', index_col=0, parse_dates=True)
+        else:
+            raise FileNotFoundError(f'No data file for {ticker} in {self.directory}')
+        return _date_range(data, start_date, end_date)
+
+
+class InMemoryProvider(MarketDataProvider):
+    """Provider serving fixed dataframes keyed by ticker, for deterministic runs (e.g. tests and benchmarks)."""
+
+    def __init__(self, frames=None):
+        """
+        Params:
+        frames: dictionary of dataframes keyed by ticker symbol
+        """
+        self.frames = {ticker.upper(): data for ticker, data in (frames or {}).items()}
+
+    def add(self, ticker, data):
+        """Adds or replaces data served for ticker."""
+        self.frames[ticker.upper()] = data
+
+    def get_historical_data(self, ticker, start_date=None, end_date=None, cache_data=True, cache_days=1):
+        try:
+            data = self.frames[ticker.upper()]
+        except KeyError:
+            raise KeyError(f'No data for {ticker} in in-memory provider') from None
+        return _date_range(data, start_date, end_date)
+
+
+PROVIDERS = {
+    'yahoo': YahooProvider,
+    'directory': DirectoryProvider,
+    'memory': InMemoryProvider
+}
+
+
+def create_provider(name, **kwargs):
+    """
+    Creates provider from its name.
+
+    Params:
+    name: 'yahoo', 'directory' or 'memory'
+    kwargs: parameters of provider constructor (directory for directory provider, frames for memory provider)
+    """
+    try:
+        return PROVIDERS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f'Unknown market data provider: {name}, expected one of {list(PROVIDERS)}') from None
+
+
+def _provider_from_environment():
+    directory = os.environ.get(DATA_DIR_ENV)
+    name = os.environ.get(PROVIDER_ENV, 'directory' if directory else 'yahoo')
+    if name == 'directory':
+        if not directory:
+            raise ValueError(f'{DATA_DIR_ENV} must be set for directory market data provider')
+        return DirectoryProvider(directory)
+    return create_provider(name)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """Returns provider used by Ticker, created from environment variables (yahoo by default) on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = _provider_from_environment()
+    return _provider
+
+
+def configure_provider(provider, **kwargs):
+    """
+    Replaces provider used by Ticker.
+
+    Params:
+    provider: MarketDataProvider instance or provider name ('yahoo', 'directory' or 'memory')
+    kwargs: parameters of provider constructor when provider is specified by name
+    """
+    global _provider
+    if not isinstance(provider, MarketDataProvider):
+        provider = create_provider(provider, **kwargs)
+    with _provider_lock:
+        _provider = provider
+    return provider
@@ -0,0 +1,316 @@
+"""
+Instrumentation of pricing calls: latency histograms of models, Spark round-trip and decode times, payload sizes,
+response cache lookups and error counts.
+
+Recording is disabled by default, instrumented code then only checks module flag `enabled`. After enable() every
+observation is aggregated in process-wide registry (exported in Prometheus text format by prometheus_text,
+start_metrics_server or /metrics endpoint of the pricing service) and passed to registered callbacks.
+"""
+# Standard library imports
+import math
+import time
+import inspect
+import warnings
+import functools
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds of histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(64 * 4 ** i for i in range(10))  # 64 B to 16 MiB
+
+CALCULATION_SECONDS = 'option_pricing_calculation_seconds'
+ERRORS = 'option_pricing_errors_total'
+SPARK_ROUND_TRIP_SECONDS = 'option_pricing_spark_round_trip_seconds'
+SPARK_DECODE_SECONDS = 'option_pricing_spark_decode_seconds'
+SPARK_REQUEST_BYTES = 'option_pricing_spark_request_bytes'
+SPARK_RESPONSE_BYTES = 'option_pricing_spark_response_bytes'
+CACHE_LOOKUPS = 'option_pricing_cache_lookups_total'
+
+DESCRIPTIONS = {
+    CALCULATION_SECONDS: 'Duration of pricing calls by model and method (calculate_option_price, price_batch...)',
+    ERRORS: 'Errors raised by pricing calls and Spark requests',
+    SPARK_ROUND_TRIP_SECONDS: 'Duration of Spark HTTP requests until the whole response is received',
+    SPARK_DECODE_SECONDS: 'Duration of decoding Spark JSON responses',
+    SPARK_REQUEST_BYTES: 'Size of Spark request bodies',
+    SPARK_RESPONSE_BYTES: 'Size of Spark response bodies',
+    CACHE_LOOKUPS: 'Spark response cache lookups by result (memory_hit, disk_hit, miss)'
+}
+
+BUCKETS = {
+    SPARK_REQUEST_BYTES: SIZE_BUCKETS,
+    SPARK_RESPONSE_BYTES: SIZE_BUCKETS
+}
+
+# Attribute marking exceptions already counted by record_error
+_COUNTED_ATTRIBUTE = '_option_pricing_error_counted'
+
+# Checked by instrumented code before doing any work, so disabled instrumentation costs one attribute lookup
+enabled = False
+
+
+class _Histogram:
+    """Cumulative histogram with fixed bucket bounds."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # Linear scan is faster than bisect for few buckets and typical values in lower ones
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe registry of histograms and counters keyed by metric name and labels."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, labels):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(BUCKETS.get(name, LATENCY_BUCKETS))
+            histogram.observe(value)
+
+    def increment(self, name, amount, labels):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """
+        Returns dictionary with copies of current values: 'counters' maps (name, labels) to value,
+        'histograms' maps (name, labels) to dictionary with buckets, counts, sum and count.
+        """
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'histograms': {key: {'buckets': h.buckets, 'counts': list(h.counts), 'sum': h.sum, 'count': h.count}
+                               for key, h in self._histograms.items()}
+            }
+
+
+registry = MetricsRegistry()
+_callbacks = []
+
+
+def enable(callback=None):
+    """
+    Starts recording metrics.
+
+    Params:
+    callback: optional function called with (kind, name, value, labels) for every observation,
+              kind is 'histogram' or 'counter' and labels is dictionary (see add_callback)
+    """
+    global enabled
+    if callback is not None:
+        add_callback(callback)
+    enabled = True
+
+
+def disable():
+    """Stops recording metrics (already recorded values are kept, see reset)."""
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Removes all recorded values."""
+    registry.clear()
+
+
+def add_callback(callback):
+    """Registers function called with (kind, name, value, labels) for every observation."""
+    _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    """Unregisters callback added with add_callback or enable."""
+    _callbacks.remove(callback)
+
+
+def _notify(kind, name, value, labels):
+    for callback in list(_callbacks):
+        try:
+            callback(kind, name, value, dict(labels))
+        except Exception as e:
+            # Broken exporter must not break pricing
+            warnings.warn(f'Metrics callback {callback!r} failed: {e!r}')
+
+
+def observe(name, value, **labels):
+    """Records value in histogram name with labels (no-op while disabled)."""
+    if not enabled:
+        return
+    labels = tuple(sorted(labels.items()))
+    registry.observe(name, value, labels)
+    if _callbacks:
+        _notify('histogram', name, value, labels)
+
+
+def increment(name, amount=1, **labels):
+    """Increments counter name with labels (no-op while disabled)."""
+    if not enabled:
+        return
+    labels = tuple(sorted(labels.items()))
+    registry.increment(name, amount, labels)
+    if _callbacks:
+        _notify('counter', name, amount, labels)
+
+
+def record_error(component, error, **labels):
+    """
+    Counts error raised by component (e.g. model name or 'spark'), labeled with exception class name.
+    Exception is counted once, by the innermost component recording it, also when it propagates through nested
+    instrumented calls (e.g. Spark failure raised from model method).
+    """
+    if not enabled or getattr(error, _COUNTED_ATTRIBUTE, False):
+        return
+    try:
+        setattr(error, _COUNTED_ATTRIBUTE, True)
+    except AttributeError:
+        pass
+    increment(ERRORS, component=component, error=type(error).__name__, **labels)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Context manager recording duration of its block in histogram name (also when the block raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def instrumented(method):
+    """
+    Decorator recording duration of pricing method in CALCULATION_SECONDS and its errors, labeled with model class
+    and method name. Works with instance methods, classmethods (applied below @classmethod) and coroutines.
+    """
+    name = method.__name__
+
+    def _model(owner):
+        return owner.__name__ if isinstance(owner, type) else type(owner).__name__
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def wrapper(owner, *args, **kwargs):
+            if not enabled:
+                return await method(owner, *args, **kwargs)
+            model = _model(owner)
+            start = time.perf_counter()
+            try:
+                return await method(owner, *args, **kwargs)
+            except Exception as e:
+                record_error(model, e)
+                raise
+            finally:
+                observe(CALCULATION_SECONDS, time.perf_counter() - start, model=model, method=name)
+        return wrapper
+
+    @functools.wraps(method)
+    def wrapper(owner, *args, **kwargs):
+        if not enabled:
+            return method(owner, *args, **kwargs)
+        model = _model(owner)
+        start = time.perf_counter()
+        try:
+            return method(owner, *args, **kwargs)
+        except Exception as e:
+            record_error(model, e)
+            raise
+        finally:
+            observe(CALCULATION_SECONDS, time.perf_counter() - start, model=model, method=name)
+    return wrapper
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in items) + '}'
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_text():
+    """Returns recorded metrics in Prometheus text exposition format."""
+    snapshot = registry.snapshot()
+    lines = []
+    for name in sorted({name for name, _ in snapshot['counters']}):
+        lines.append(f'# HELP {name} {DESCRIPTIONS.get(name, name)}')
+        lines.append(f'# TYPE {name} counter')
+        for (metric, labels), value in sorted(snapshot['counters'].items()):
+            if metric == name:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+    for name in sorted({name for name, _ in snapshot['histograms']}):
+        lines.append(f'# HELP {name} {DESCRIPTIONS.get(name, name)}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, labels), histogram in sorted(snapshot['histograms'].items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(histogram['buckets'] + (math.inf,), histogram['counts']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", _format_value(float(bound)))])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram["sum"])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """
+    Enables metrics and serves them in Prometheus text format from background thread. Returns the server.
+
+    Params:
+    port: port of metrics endpoint (0 picks free port, see server.server_port)
+    host: interface to listen on
+    """
+    enable()
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,201 @@
+# Standard library imports
+import os
+import time
+from enum import Enum
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+# Third party imports
+import numpy as np
+
+# Local package imports
+from .base import BACKEND, CONTRACT_COLUMNS, EXERCISE_STYLE, contracts_frame
+
+# Number of shards per worker: more shards than workers let idle workers pick up remaining work
+SHARDS_PER_WORKER = 4
+
+
+class PORTFOLIO_MODEL(Enum):
+    BLACK_SCHOLES = 'black_scholes'
+    BINOMIAL = 'binomial'
+    MONTE_CARLO = 'monte_carlo'
+
+
+# Output columns written by workers for each model
+OUTPUT_COLUMNS = {
+    PORTFOLIO_MODEL.BLACK_SCHOLES.value: ['callprice', 'putprice', 'Delta', 'Gamma', 'Theta', 'Vega', 'Rho'],
+    PORTFOLIO_MODEL.BINOMIAL.value: ['callprice', 'putprice'],
+    PORTFOLIO_MODEL.MONTE_CARLO.value: ['CallPrice', 'CallStdError', 'PutPrice', 'PutStdError']
+}
+
+# Per-contract column overriding model parameter of the same name (the only parameter driving cost of contract)
+COST_COLUMNS = {
+    PORTFOLIO_MODEL.BINOMIAL.value: 'number_of_time_steps',
+    PORTFOLIO_MODEL.MONTE_CARLO.value: 'number_of_simulations'
+}
+
+
+def _exercise_dates(T, parameters):
+    """Returns number of Longstaff-Schwartz exercise dates of contracts: the specified one, or one per day to maturity."""
+    if parameters.get('number_of_exercise_dates'):
+        return np.full(np.shape(T), int(parameters['number_of_exercise_dates']))
+    return np.maximum(np.round(np.asarray(T) * 365), 1).astype(int)
+
+
+def _estimated_cost(model, inputs, parameters):
+    """
+    Returns relative cost of pricing every contract: lattice rollback grows with steps^2 (plus quarter of it for
+    Richardson coarse tree), Longstaff-Schwartz with simulations x exercise dates, European simulation with simulations.
+    """
+    if model == PORTFOLIO_MODEL.BINOMIAL.value:
+        steps = inputs[:, len(CONTRACT_COLUMNS)]
+        return steps ** 2 * (1.25 if parameters.get('richardson') else 1.0)
+    if model == PORTFOLIO_MODEL.MONTE_CARLO.value:
+        simulations = inputs[:, len(CONTRACT_COLUMNS)]
+        if parameters.get('exercise_style') == EXERCISE_STYLE.AMERICAN.value:
+            return simulations * _exercise_dates(inputs[:, 2], parameters)
+        return simulations
+    return np.ones(len(inputs))
+
+
+def _shards(cost, number_of_shards):
+    """
+    Splits rows (sorted by decreasing cost) into contiguous ranges of about equal total cost.
+    Returns list of (start, stop) ranges, most expensive first.
+    """
+    cumulative = np.cumsum(cost)
+    boundaries = np.searchsorted(cumulative, cumulative[-1] * np.arange(1, number_of_shards) / number_of_shards)
+    edges = np.unique(np.concatenate(([0], boundaries, [len(cost)])))
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+
+
+def _price_rows(model, inputs, indices, parameters):
+    """Prices rows of inputs (contract columns followed by optional cost column) and returns outputs matrix."""
+    contracts = inputs[:, :len(CONTRACT_COLUMNS)]
+    if model == PORTFOLIO_MODEL.BLACK_SCHOLES.value:
+        from .BlackScholesModel import black_scholes
+        outputs = black_scholes(*contracts.T)
+        return np.column_stack([np.broadcast_to(outputs[column], len(inputs)) for column in OUTPUT_COLUMNS[model]])
+
+    if model == PORTFOLIO_MODEL.BINOMIAL.value:
+        from .BinomialTreeModel import BinomialTreeModel
+        steps = inputs[:, len(CONTRACT_COLUMNS)].astype(int)
+        outputs = np.empty((len(inputs), 2))
+        # Contracts with the same number of steps are rolled back together
+        for n in np.unique(steps):
+            rows = steps == n
+            prices = BinomialTreeModel.price_batch(contracts[rows], int(n), parameters.get('tree_type', 'crr'),
+                                                   parameters.get('richardson', False))
+            outputs[rows] = prices[OUTPUT_COLUMNS[model]].to_numpy()
+        return outputs
+
+    from .MonteCarloSimulation import MonteCarloPricing
+    seed = parameters.get('seed')
+    options = {key: value for key, value in parameters.items() if key not in ('seed', 'number_of_exercise_dates')}
+    exercise_dates = _exercise_dates(contracts[:, 2], parameters)
+    outputs = np.empty((len(inputs), len(OUTPUT_COLUMNS[model])))
+    rows = zip(contracts, inputs[:, -1], exercise_dates, indices)
+    for row, ((S, K, T, r, sigma), simulations, dates, index) in enumerate(rows):
+        # Seed derived from position of contract in portfolio, so results don't depend on sharding
+        pricing = MonteCarloPricing(S, K, T * 365, r, sigma, int(simulations), backend=BACKEND.LOCAL.value,
+                                    seed=None if seed is None else [seed, int(index)],
+                                    number_of_exercise_dates=int(dates), **options)
+        result = pricing.calculate_option_price('Call Option')
+        outputs[row] = [result[column] for column in OUTPUT_COLUMNS[model]]
+    return outputs
+
+
+def _price_shard(model, parameters, input_name, output_name, shape, number_of_outputs, start, stop):
+    """
+    Worker task: prices rows start:stop of contracts held in shared memory and writes results into shared output
+    matrix. Returns (process id, start, stop, seconds) - only these few values travel back through pickling.
+    """
+    started = time.perf_counter()
+    input_memory = shared_memory.SharedMemory(name=input_name)
+    output_memory = shared_memory.SharedMemory(name=output_name)
+    try:
+        inputs = np.ndarray(shape, dtype=np.float64, buffer=input_memory.buf)
+        outputs = np.ndarray((shape[0], number_of_outputs), dtype=np.float64, buffer=output_memory.buf)
+        # Last input column holds position of contract in the original portfolio
+        outputs[start:stop] = _price_rows(model, inputs[start:stop, :-1], inputs[start:stop, -1], parameters)
+        del inputs, outputs
+    finally:
+        input_memory.close()
+        output_memory.close()
+    return os.getpid(), start, stop, time.perf_counter() - started
+
+
+def price_portfolio(contracts, model=PORTFOLIO_MODEL.BINOMIAL.value, workers=None, **parameters):
+    """
+    Prices book of contracts on a pool of worker processes.
+    Contracts are sorted by estimated cost and split into shards of about equal cost (several per worker, most
+    expensive first, so workers finishing early pick up remaining shards). Contract arrays and results are exchanged
+    through shared memory, only shard boundaries and timings are pickled.
+    Returns tuple (DataFrame of results aligned with contracts, DataFrame of per-worker timings).
+
+    Params:
+    contracts: DataFrame with columns S, K, T, r, sigma or array-like of such rows (T in years); DataFrame can also
+               contain number_of_time_steps (binomial) or number_of_simulations (Monte Carlo) column per contract
+    model: 'black_scholes', 'binomial' or 'monte_carlo' (all priced locally)
+    workers: number of worker processes, defaults to number of CPUs
+    parameters: model parameters shared by contracts: number_of_time_steps, tree_type, richardson for binomial model;
+                number_of_simulations, seed, antithetic, control_variate, exercise_style, number_of_exercise_dates,
+                basis, basis_degree for Monte Carlo model (backend can only be 'local')
+    """
+    import pandas as pd
+    model = PORTFOLIO_MODEL(model).value
+    backend = parameters.pop('backend', BACKEND.LOCAL.value)
+    if backend != BACKEND.LOCAL.value:
+        raise ValueError(f"Portfolio is priced on local worker processes, backend '{backend}' isn't supported")
+    workers = workers or os.cpu_count()
+    frame = contracts_frame(contracts)
+    index = frame.index
+
+    # Input matrix: contract columns, cost column (if model has one) and position in portfolio
+    columns = [frame.to_numpy(dtype=np.float64)]
+    cost_column = COST_COLUMNS.get(model)
+    if cost_column is not None:
+        if isinstance(contracts, pd.DataFrame) and cost_column in contracts.columns:
+            per_contract = contracts[cost_column].to_numpy(dtype=np.float64)
+        elif cost_column in parameters:
+            per_contract = np.full(len(frame), float(parameters[cost_column]))
+        else:
+            raise ValueError(f"Model '{model}' needs {cost_column} parameter or column")
+        columns.append(per_contract[:, None])
+        parameters = {key: value for key, value in parameters.items() if key != cost_column}
+    columns.append(np.arange(len(frame), dtype=np.float64)[:, None])
+    inputs = np.hstack(columns)
+
+    cost = _estimated_cost(model, inputs[:, :-1], parameters)
+    order = np.argsort(-cost, kind='stable')
+    inputs = inputs[order]
+    shards = _shards(cost[order], workers * SHARDS_PER_WORKER) if len(inputs) else []
+    number_of_outputs = len(OUTPUT_COLUMNS[model])
+
+    input_memory = shared_memory.SharedMemory(create=True, size=max(inputs.nbytes, 1))
+    output_memory = shared_memory.SharedMemory(create=True, size=max(len(inputs) * number_of_outputs * 8, 1))
+    try:
+        np.ndarray(inputs.shape, dtype=np.float64, buffer=input_memory.buf)[:] = inputs
+        tasks = [(model, parameters, input_memory.name, output_memory.name, inputs.shape, number_of_outputs, start, stop)
+                 for start, stop in shards]
+        with ProcessPoolExecutor(max_workers=min(workers, max(len(tasks), 1))) as executor:
+            reports = [future.result() for future in [executor.submit(_price_shard, *task) for task in tasks]]
+
+        outputs = np.empty((len(inputs), number_of_outputs))
+        # Rows are scattered back from cost order to portfolio order
+        outputs[order] = np.ndarray((len(inputs), number_of_outputs), dtype=np.float64, buffer=output_memory.buf)
+    finally:
+        input_memory.close()
+        input_memory.unlink()
+        output_memory.close()
+        output_memory.unlink()
+
+    results = pd.DataFrame(outputs, index=index, columns=OUTPUT_COLUMNS[model])
+
+    sorted_cost = cost[order]
+    timings = pd.DataFrame(
+        [(pid, stop - start, sorted_cost[start:stop].sum(), seconds) for pid, start, stop, seconds in reports],
+        columns=['worker', 'contracts', 'estimated_cost', 'seconds'])
+    timings = timings.groupby('worker').agg(shards=('seconds', 'size'), contracts=('contracts', 'sum'),
+                                            estimated_cost=('estimated_cost', 'sum'), seconds=('seconds', 'sum'))
+    return results, timings
@@ -0,0 +1,189 @@
+# Standard library imports
+import os
+import json
+import threading
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+
+class PriceStore:
+    """
+    Class implementing local store of daily price histories, one set of files per symbol.
+    Bars are kept in raw binary files: float64 matrix with one row per bar (all columns, e.g. Open, High, Low,
+    Close, Volume, Adj Close) and int64 array of bar dates in nanoseconds. New bars are appended to the end of files,
+    so refreshing history writes only bars newer than the last stored date, and reads memory-map the files instead
+    of loading them (dataframes returned by read are views over the mapped files).
+    """
+
+    def __init__(self, directory='price_store'):
+        """
+        Initializes store in specified directory (created if it doesn't exist).
+
+        Params:
+        directory: path of the directory holding stored histories
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, symbol, extension):
+        return os.path.join(self.directory, f'{symbol.upper()}.{extension}')
+
+    def columns(self, symbol):
+        """Returns list of stored column names for symbol, None if symbol isn't stored."""
+        try:
+            with open(self._path(symbol, 'json')) as f:
+                return json.load(f)['columns']
+        except FileNotFoundError:
+            return None
+
+    def _length(self, symbol, columns):
+        """Number of complete bars stored (bar counts only once both its values and date are written)."""
+        values = os.path.getsize(self._path(symbol, 'values')) // (8 * len(columns))
+        dates = os.path.getsize(self._path(symbol, 'dates')) // 8
+        return min(values, dates)
+
+    def _dates(self, symbol, length):
+        return np.memmap(self._path(symbol, 'dates'), dtype='datetime64[ns]', mode='r', shape=(length,))
+
+    def first_date(self, symbol):
+        """Returns date of the first stored bar for symbol, None if nothing is stored."""
+        columns = self.columns(symbol)
+        if columns is None:
+            return None
+        length = self._length(symbol, columns)
+        if length == 0:
+            return None
+        return pd.Timestamp(self._dates(symbol, length)[0])
+
+    def last_date(self, symbol):
+        """Returns date of the last stored bar for symbol, None if nothing is stored."""
+        columns = self.columns(symbol)
+        if columns is None:
+            return None
+        length = self._length(symbol, columns)
+        if length == 0:
+            return None
+        return pd.Timestamp(self._dates(symbol, length)[length - 1])
+
+    def read(self, symbol, start_date=None, end_date=None):
+        """
+        Returns stored bars of symbol between start_date and end_date (both inclusive) as dataframe
+        backed by memory-mapped file, None if nothing is stored.
+
+        Params:
+        symbol: ticker symbol
+        start_date: first date of returned bars, from the first stored bar if None
+        end_date: last date of returned bars, up to the last stored bar if None
+        """
+        columns = self.columns(symbol)
+        if columns is None:
+            return None
+        length = self._length(symbol, columns)
+        if length == 0:
+            return None
+
+        dates = self._dates(symbol, length)
+        first = 0 if start_date is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date), 'ns'), side='left')
+        last = length if end_date is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date), 'ns'), side='right')
+
+        values = np.memmap(self._path(symbol, 'values'), dtype=np.float64, mode='r', shape=(length, len(columns)))
+        index = pd.DatetimeIndex(np.asarray(dates[first:last]), name='Date')
+        return pd.DataFrame(values[first:last], index=index, columns=columns, copy=False)
+
+    def append(self, symbol, data):
+        """
+        Appends bars of data newer than the last stored date. Returns number of appended bars.
+        First append defines stored columns, later data is aligned to them (missing columns are stored as NaN).
+
+        Params:
+        symbol: ticker symbol
+        data: dataframe of bars indexed by date
+        """
+        if data is None or len(data) == 0:
+            return 0
+        with self._lock:
+            columns = self.columns(symbol)
+            if columns is None:
+                columns = [str(column) for column in data.columns]
+                for extension in ('values', 'dates'):
+                    open(self._path(symbol, extension), 'wb').close()
+                with open(self._path(symbol, 'json'), 'w') as f:
+                    json.dump({'columns': columns}, f)
+
+            data = data.sort_index()
+            last = self.last_date(symbol)
+            if last is not None:
+                data = data[data.index > last]
+            if len(data) == 0:
+                return 0
+
+            values = np.ascontiguousarray(data.reindex(columns=columns).to_numpy(dtype=np.float64))
+            dates = np.asarray(pd.DatetimeIndex(data.index).values, dtype='datetime64[ns]').view(np.int64)
+
+            # Values are written before dates, so interrupted append never exposes partially written bar,
+            # and leftovers of such append are truncated before writing new bars
+            length = self._length(symbol, columns)
+            with open(self._path(symbol, 'values'), 'r+b') as f:
+                f.truncate(length * 8 * len(columns))
+                f.seek(0, os.SEEK_END)
+                f.write(values.tobytes())
+            with open(self._path(symbol, 'dates'), 'r+b') as f:
+                f.truncate(length * 8)
+                f.seek(0, os.SEEK_END)
+                f.write(dates.tobytes())
+            return len(data)
+
+    def prepend(self, symbol, data):
+        """
+        Inserts bars of data older than the first stored date before stored history. Returns number of inserted bars.
+        Unlike append, files of symbol are rewritten (into new files replacing the old ones, so dataframes already
+        returned by read keep their mapping of the previous files).
+
+        Params:
+        symbol: ticker symbol
+        data: dataframe of bars indexed by date
+        """
+        if data is None or len(data) == 0:
+            return 0
+        with self._lock:
+            first = self.first_date(symbol)
+            if first is not None:
+                columns = self.columns(symbol)
+                data = data.sort_index()
+                data = data[data.index < first]
+                if len(data) == 0:
+                    return 0
+
+                length = self._length(symbol, columns)
+                stored_values = np.memmap(self._path(symbol, 'values'), dtype=np.float64, mode='r', shape=(length, len(columns)))
+                stored_dates = np.memmap(self._path(symbol, 'dates'), dtype=np.int64, mode='r', shape=(length,))
+                values = np.ascontiguousarray(data.reindex(columns=columns).to_numpy(dtype=np.float64))
+                dates = np.asarray(pd.DatetimeIndex(data.index).values, dtype='datetime64[ns]').view(np.int64)
+
+                for extension, head, tail in (('values', values, stored_values), ('dates', dates, stored_dates)):
+                    with open(self._path(symbol, extension) + '.tmp', 'wb') as f:
+                        f.write(head.tobytes())
+                        f.write(np.asarray(tail).tobytes())
+                del stored_values, stored_dates
+
+                # Dates are emptied first, so interruption between the replacements leaves symbol with no complete
+                # bars (fetched again from scratch) instead of values misaligned with dates
+                open(self._path(symbol, 'dates') + '.tmp.empty', 'wb').close()
+                os.replace(self._path(symbol, 'dates') + '.tmp.empty', self._path(symbol, 'dates'))
+                os.replace(self._path(symbol, 'values') + '.tmp', self._path(symbol, 'values'))
+                os.replace(self._path(symbol, 'dates') + '.tmp', self._path(symbol, 'dates'))
+                return len(data)
+        # Nothing stored yet, so bars are simply appended
+        return self.append(symbol, data)
+
+    def remove(self, symbol):
+        """Removes stored history of symbol."""
+        with self._lock:
+            for extension in ('json', 'values', 'dates'):
+                try:
+                    os.remove(self._path(symbol, extension))
+                except FileNotFoundError:
+                    pass
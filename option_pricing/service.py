@@ -0,0 +1,418 @@
+"""
+ASGI service pricing options over HTTP.
+
+Endpoints (request and response bodies are JSON, batch responses can also be Arrow IPC stream):
+- GET  /health
+- POST /price/{model}          one contract: {"S", "K", "T", "r", "sigma"} plus model parameters
+- POST /price/{model}/batch    many contracts: {"contracts": [{"S", "K", "T", "r", "sigma"}, ...]} (or object of
+                               column arrays) plus model parameters shared by all contracts
+- GET  /metrics                pricing metrics in Prometheus text format, only served by single process service started
+                               with --metrics or OPTION_PRICING_METRICS=1
+
+Model is one of 'black_scholes', 'binomial' or 'monte_carlo', T is time to maturity in years.
+Model parameters: backend ('local' or 'spark', Black-Scholes and Monte Carlo), number_of_time_steps, tree_type,
+richardson (binomial), number_of_simulations, seed, antithetic, control_variate, exercise_style (Monte Carlo).
+Batch responses are returned in Arrow format when requested with ?format=arrow or Accept: application/vnd.apache.arrow.stream.
+
+Run with several worker processes: python -m option_pricing.service --workers 4 --port 8000
+Every worker process records its own metrics, so with several workers each of them serves its metrics on separate
+port (first free one from --metrics-port on, e.g. 9000-9003 for 4 workers, on interface given by --host), scraped as
+separate targets:
+python -m option_pricing.service --workers 4 --port 8000 --metrics --metrics-port 9000
+"""
+# Standard library imports
+import io
+import os
+import math
+import argparse
+from enum import Enum
+from contextlib import asynccontextmanager
+
+# Third party imports
+import numpy as np
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+# Local package imports
+from . import metrics
+from .base import BACKEND, CONTRACT_COLUMNS, EXERCISE_STYLE, contracts_frame
+from .BinomialTreeModel import TREE_TYPE, BinomialTreeModel
+from .BlackScholesModel import BlackScholesModel
+from .MonteCarloSimulation import MonteCarloPricing
+
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+# Environment variables enabling metrics: served from /metrics of single process service, or by each worker process
+# on first free port of range (e.g. 9000-9003)
+METRICS_ENV = 'OPTION_PRICING_METRICS'
+METRICS_PORTS_ENV = 'OPTION_PRICING_METRICS_PORTS'
+METRICS_HOST_ENV = 'OPTION_PRICING_METRICS_HOST'
+
+# Limits protecting workers from requests which would take minutes or exhaust memory
+MAX_BATCH_SIZE = 100_000
+MAX_TIME_STEPS = 100_000
+MAX_SIMULATIONS = 10_000_000
+
+# Limits of total work of request, so batches can't multiply per contract limits:
+# sum of steps^2 over contracts of binomial request, and sum of simulated paths x exercise dates of Monte Carlo one
+MAX_LATTICE_WORK = MAX_TIME_STEPS ** 2
+MAX_SIMULATION_WORK = 10 * MAX_SIMULATIONS
+
+
+class MODEL(Enum):
+    BLACK_SCHOLES = 'black_scholes'
+    BINOMIAL = 'binomial'
+    MONTE_CARLO = 'monte_carlo'
+
+
+class ValidationError(ValueError):
+    """Raised for invalid request parameters, returned to client with status 422."""
+    pass
+
+
+class UnknownModelError(Exception):
+    """Raised for requests to model which doesn't exist, returned to client with status 404."""
+    pass
+
+
+def _number(body, name, default=None, minimum=None, integer=False, positive=False):
+    """Returns validated numeric field of request body."""
+    value = body.get(name, default)
+    if value is None:
+        raise ValidationError(f"Missing field '{name}'")
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValidationError(f"Field '{name}' must be a finite number")
+    if integer:
+        if value != int(value):
+            raise ValidationError(f"Field '{name}' must be an integer")
+        value = int(value)
+    if minimum is not None and value < minimum:
+        raise ValidationError(f"Field '{name}' must be at least {minimum}")
+    if positive and value <= 0:
+        raise ValidationError(f"Field '{name}' must be positive")
+    return value
+
+
+def _choice(body, name, enum, default):
+    """Returns validated field of request body holding one of enum values."""
+    value = body.get(name, default)
+    allowed = [member.value for member in enum]
+    if value not in allowed:
+        raise ValidationError(f"Field '{name}' must be one of {allowed}")
+    return value
+
+
+def _flag(body, name, default):
+    """Returns validated boolean field of request body."""
+    value = body.get(name, default)
+    if not isinstance(value, bool):
+        raise ValidationError(f"Field '{name}' must be true or false")
+    return value
+
+
+def _contract(body):
+    """Returns validated (S, K, T, r, sigma) of single contract."""
+    return (
+        _number(body, 'S', positive=True), _number(body, 'K', positive=True), _number(body, 'T', positive=True),
+        _number(body, 'r'), _number(body, 'sigma', minimum=0)
+    )
+
+
+def _contracts(body):
+    """Returns validated batch of contracts as DataFrame with CONTRACT_COLUMNS."""
+    contracts = body.get('contracts')
+    if isinstance(contracts, list):
+        for contract in contracts:
+            if not isinstance(contract, dict):
+                raise ValidationError("Field 'contracts' must be a list of objects or an object of column arrays")
+            _contract(contract)
+        rows = [[contract[column] for column in CONTRACT_COLUMNS] for contract in contracts]
+    elif isinstance(contracts, dict):
+        try:
+            rows = np.column_stack([np.asarray(contracts[column], dtype=float) for column in CONTRACT_COLUMNS])
+        except KeyError as e:
+            raise ValidationError(f'Contracts are missing column {e}') from None
+        except (TypeError, ValueError):
+            raise ValidationError('Contract columns must be numeric arrays of equal length') from None
+    else:
+        raise ValidationError("Field 'contracts' must be a list of objects or an object of column arrays")
+
+    if len(rows) == 0:
+        raise ValidationError('Batch contains no contracts')
+    if len(rows) > MAX_BATCH_SIZE:
+        raise ValidationError(f'Batch can contain at most {MAX_BATCH_SIZE} contracts')
+    try:
+        contracts = contracts_frame(rows)
+    except ValueError:
+        raise ValidationError('Contract columns must be one-dimensional numeric arrays') from None
+    values = contracts.to_numpy()
+    if not np.isfinite(values).all():
+        raise ValidationError('Contract values must be finite numbers')
+    if (contracts[['S', 'K', 'T']].to_numpy() <= 0).any() or (contracts['sigma'].to_numpy() < 0).any():
+        raise ValidationError('Contract values S, K and T must be positive and sigma non-negative')
+    return contracts
+
+
+def _model_parameters(model, body):
+    """Returns validated model parameters (shared by all contracts of batch)."""
+    if model == MODEL.BLACK_SCHOLES.value:
+        return {'backend': _choice(body, 'backend', BACKEND, BACKEND.LOCAL.value)}
+    if model == MODEL.BINOMIAL.value:
+        parameters = {
+            'number_of_time_steps': _number(body, 'number_of_time_steps', 1000, minimum=1, integer=True),
+            'tree_type': _choice(body, 'tree_type', TREE_TYPE, TREE_TYPE.CRR.value),
+            'richardson': _flag(body, 'richardson', False)
+        }
+        if parameters['number_of_time_steps'] > MAX_TIME_STEPS:
+            raise ValidationError(f"Field 'number_of_time_steps' must be at most {MAX_TIME_STEPS}")
+        if parameters['richardson'] and parameters['tree_type'] == TREE_TYPE.CRR.value:
+            raise ValidationError(f"Field 'richardson' requires 'tree_type' {TREE_TYPE.LEISEN_REIMER.value} or {TREE_TYPE.BBS.value}")
+        if parameters['richardson'] and parameters['number_of_time_steps'] < 2:
+            raise ValidationError("Field 'richardson' requires 'number_of_time_steps' of at least 2")
+        return parameters
+    parameters = {
+        'backend': _choice(body, 'backend', BACKEND, BACKEND.LOCAL.value),
+        'number_of_simulations': _number(body, 'number_of_simulations', 100_000, minimum=1, integer=True),
+        'seed': None if body.get('seed') is None else _number(body, 'seed', minimum=0, integer=True),
+        'antithetic': _flag(body, 'antithetic', True),
+        'control_variate': _flag(body, 'control_variate', True),
+        'exercise_style': _choice(body, 'exercise_style', EXERCISE_STYLE, EXERCISE_STYLE.EUROPEAN.value)
+    }
+    if parameters['number_of_simulations'] > MAX_SIMULATIONS:
+        raise ValidationError(f"Field 'number_of_simulations' must be at most {MAX_SIMULATIONS}")
+    if parameters['exercise_style'] == EXERCISE_STYLE.AMERICAN.value and parameters['backend'] != BACKEND.LOCAL.value:
+        raise ValidationError(f"Field 'exercise_style' {EXERCISE_STYLE.AMERICAN.value} requires 'backend' {BACKEND.LOCAL.value}")
+    return parameters
+
+
+def _check_work(model, T, parameters):
+    """
+    Raises ValidationError if pricing contracts with maturities T (years) exceeds work limits of one request.
+
+    Params:
+    model: one of MODEL values
+    T: array of times to maturity of contracts
+    parameters: model parameters (see _model_parameters)
+    """
+    if model == MODEL.BINOMIAL.value:
+        # Richardson extrapolation adds rollback of lattice with half the steps
+        work = len(T) * parameters['number_of_time_steps'] ** 2 * (1.25 if parameters['richardson'] else 1.0)
+        if work > MAX_LATTICE_WORK:
+            raise ValidationError(f'Request exceeds work limit: contracts x number_of_time_steps^2 must be at most '
+                                  f'{MAX_LATTICE_WORK:.0e}')
+    elif model == MODEL.MONTE_CARLO.value:
+        if parameters['exercise_style'] == EXERCISE_STYLE.AMERICAN.value:
+            # One exercise date per day to maturity (see _monte_carlo_pricing)
+            exercise_dates = np.maximum(np.round(np.asarray(T) * 365), 1).sum()
+        else:
+            exercise_dates = len(T)
+        if parameters['number_of_simulations'] * exercise_dates > MAX_SIMULATION_WORK:
+            raise ValidationError(f'Request exceeds work limit: contracts x number_of_simulations (x exercise dates of '
+                                  f'American options) must be at most {MAX_SIMULATION_WORK:.0e}')
+
+
+def _monte_carlo_pricing(S, K, T, r, sigma, parameters):
+    """Creates Monte Carlo model for contract with time to maturity in years."""
+    days = T * 365
+    return MonteCarloPricing(S, K, days, r, sigma, number_of_exercise_dates=max(1, round(days)), **parameters)
+
+
+def price_contract(model, contract, parameters):
+    """
+    Prices single contract with specified model. Returns dictionary of outputs.
+
+    Params:
+    model: one of MODEL values
+    contract: tuple (S, K, T, r, sigma), T in years
+    parameters: model parameters (see _model_parameters)
+    """
+    S, K, T, r, sigma = contract
+    if model == MODEL.BLACK_SCHOLES.value:
+        return BlackScholesModel(S, K, T * 365, r, sigma, **parameters).calculate_option_price('Call Option')
+    if model == MODEL.BINOMIAL.value:
+        call_price, put_price = BinomialTreeModel(S, K, T * 365, r, sigma, **parameters).calculate_prices()
+        return {'callprice': call_price, 'putprice': put_price}
+    return _monte_carlo_pricing(S, K, T, r, sigma, parameters).calculate_option_price('Call Option')
+
+
+def price_contracts(model, contracts, parameters):
+    """
+    Prices batch of contracts with specified model. Returns DataFrame aligned with contracts.
+
+    Params:
+    model: one of MODEL values
+    contracts: DataFrame with CONTRACT_COLUMNS
+    parameters: model parameters (see _model_parameters)
+    """
+    import pandas as pd
+    if model == MODEL.BLACK_SCHOLES.value:
+        return BlackScholesModel.price_batch(contracts, **parameters)
+    if model == MODEL.BINOMIAL.value:
+        return BinomialTreeModel.price_batch(contracts, **parameters)
+    outputs = [_monte_carlo_pricing(*contract, parameters).calculate_option_price('Call Option')
+               for contract in contracts.itertuples(index=False, name=None)]
+    return pd.DataFrame([_json_ready(output) for output in outputs], index=contracts.index)
+
+
+def _json_ready(value):
+    """Converts NumPy values in outputs into JSON serializable ones (non-finite numbers become null)."""
+    if isinstance(value, dict):
+        return {key: _json_ready(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_json_ready(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _wants_arrow(request):
+    return request.query_params.get('format') == 'arrow' or ARROW_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+def _arrow_response(frame):
+    """Serializes DataFrame into Arrow IPC stream response."""
+    import pyarrow as pa
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(sink.getvalue(), media_type=ARROW_MEDIA_TYPE)
+
+
+async def _request_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ValidationError('Request body must be valid JSON') from None
+    if not isinstance(body, dict):
+        raise ValidationError('Request body must be a JSON object')
+    return body
+
+
+def _model(request):
+    model = request.path_params['model']
+    if model not in [member.value for member in MODEL]:
+        raise UnknownModelError(model)
+    return model
+
+
+async def health(request):
+    return JSONResponse({'status': 'ok'})
+
+
+async def metrics_endpoint(request):
+    return Response(metrics.prometheus_text(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
+
+async def price(request):
+    """Prices single contract."""
+    model = _model(request)
+    body = await _request_body(request)
+    contract = _contract(body)
+    parameters = _model_parameters(model, body)
+    _check_work(model, [contract[2]], parameters)
+    # Pricing is CPU bound (or blocking Spark request), so it runs in thread pool instead of the event loop
+    outputs = await run_in_threadpool(price_contract, model, contract, parameters)
+    return JSONResponse(_json_ready(outputs))
+
+
+async def price_batch(request):
+    """Prices batch of contracts."""
+    model = _model(request)
+    body = await _request_body(request)
+    contracts = _contracts(body)
+    parameters = _model_parameters(model, body)
+    _check_work(model, contracts['T'].to_numpy(), parameters)
+    outputs = await run_in_threadpool(price_contracts, model, contracts, parameters)
+    if _wants_arrow(request):
+        return _arrow_response(outputs)
+    return JSONResponse({'results': _json_ready(outputs.to_dict(orient='records'))})
+
+
+async def _validation_error(request, exc):
+    # Parameter combinations models don't support (e.g. American options on Spark) are rejected by _model_parameters,
+    # any other error raised while pricing is an error of the service (status 500)
+    return JSONResponse({'error': str(exc)}, status_code=422)
+
+
+async def _model_not_found(request, exc):
+    allowed = [member.value for member in MODEL]
+    return JSONResponse({'error': f'Unknown model {exc}, expected one of {allowed}'}, status_code=404)
+
+
+def _start_worker_metrics_server():
+    """
+    Serves metrics of this worker process on the first free port of range in METRICS_PORTS_ENV, listening on interface
+    in METRICS_HOST_ENV (the one of the service, all interfaces if not set). Returns the server.
+    """
+    first, last = (int(port) for port in os.environ[METRICS_PORTS_ENV].split('-'))
+    host = os.environ.get(METRICS_HOST_ENV, '0.0.0.0')
+    for port in range(first, last + 1):
+        try:
+            return metrics.start_metrics_server(port, host)
+        except OSError:
+            # Port taken by another worker
+            continue
+    raise RuntimeError(f'No free metrics port in range {first}-{last}')
+
+
+@asynccontextmanager
+async def _worker_metrics_lifespan(app):
+    # Runs on startup of worker process, not on import in parent process of workers
+    server = _start_worker_metrics_server()
+    try:
+        yield
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def create_app():
+    """Creates ASGI application of pricing service."""
+    routes = [
+        Route('/health', health, methods=['GET']),
+        Route('/price/{model}', price, methods=['POST']),
+        Route('/price/{model}/batch', price_batch, methods=['POST'])
+    ]
+    lifespan = None
+    if os.environ.get(METRICS_PORTS_ENV):
+        lifespan = _worker_metrics_lifespan
+    elif os.environ.get(METRICS_ENV, '').lower() in ('1', 'true', 'yes'):
+        metrics.enable()
+        routes.append(Route('/metrics', metrics_endpoint, methods=['GET']))
+    exception_handlers = {ValidationError: _validation_error, UnknownModelError: _model_not_found}
+    return Starlette(routes=routes, exception_handlers=exception_handlers, lifespan=lifespan)
+
+
+app = create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Option pricing HTTP service')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--metrics', action='store_true', help='record pricing metrics served from /metrics')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='serve metrics of each worker process on its own port, from this one on')
+    args = parser.parse_args()
+    # Worker processes inherit environment, so each of them records its own metrics
+    if args.metrics_port is not None:
+        os.environ[METRICS_PORTS_ENV] = f'{args.metrics_port}-{args.metrics_port + args.workers - 1}'
+        os.environ[METRICS_HOST_ENV] = args.host
+    elif args.metrics:
+        if args.workers > 1:
+            parser.error('--metrics with several workers needs --metrics-port, /metrics of one worker would only '
+                         'show metrics of the worker which happens to answer the scrape')
+        os.environ[METRICS_ENV] = '1'
+
+    import uvicorn
+    uvicorn.run('option_pricing.service:app', host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
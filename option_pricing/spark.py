@@ -0,0 +1,227 @@
+# Standard library imports
+import json
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Third party imports
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Local package imports
+from . import metrics
+from .cache import ResponseCache, payload_key
+
+
+SPARK_BASE_URL = "https://excel.staging.coherent.global/coherent/api/v3/folders/Microsoft Envision/services"
+
+SPARK_HEADERS = {
+    'Content-Type': 'application/json',
+    'x-tenant-name': 'coherent',
+    'x-synthetic-key': 'facaae76-30e7-4201-9cc7-683dd3a751c6'
+}
+
+# Response statuses on which Spark requests are retried
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class SparkClient:
+    """
+    Class for executing Coherent Spark services over one pooled, keep-alive HTTP session.
+    All remote pricing models share a single instance (see get_client), so TCP and TLS connections
+    are reused between prices instead of being opened again for every request.
+    """
+
+    def __init__(self, base_url=SPARK_BASE_URL, headers=None, pool_size=10, connect_timeout=3.05,
+                 read_timeout=30, max_retries=3, backoff_factor=0.3, cache=None):
+        """
+        Initializes pooled session used for calling Spark services.
+
+        Params:
+        base_url: url of the Spark folder containing pricing services
+        headers: request headers (tenant name and key), defaults to SPARK_HEADERS
+        pool_size: maximum number of keep-alive connections held open to the Spark host
+        connect_timeout: seconds to wait for establishing the connection
+        read_timeout: seconds to wait for Spark to return the response
+        max_retries: number of retries on connection errors and 429/5xx responses
+        backoff_factor: exponential backoff factor between retries (backoff_factor * 2^(retry - 1) seconds)
+        cache: ResponseCache for outputs of identical requests, caching is disabled if None
+        """
+        self.base_url = base_url.rstrip('/')
+        self.headers = dict(SPARK_HEADERS if headers is None else headers)
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.cache = cache
+        self.session = self._create_session()
+
+        # Futures of requests currently in flight, keyed by payload_key
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def _create_session(self):
+        """Creates requests session with connection pool and bounded retry policy mounted on https/http."""
+        # Spark Execute calls are pure computations, so retrying POST is safe
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['POST']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.headers.update(self.headers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def service_url(self, service):
+        """Returns Execute endpoint url for specified Spark service."""
+        return f'{self.base_url}/{service}/Execute'
+
+    @staticmethod
+    def build_payload(inputs, version_id, **request_meta):
+        """
+        Builds request body for Spark Execute endpoint.
+
+        Params:
+        inputs: dictionary of service input values
+        version_id: Spark service version identifier
+        request_meta: additional request_meta fields (e.g. compiler_type)
+        """
+        meta = {
+            "version_id": version_id,
+            "call_purpose": "Spark - API Tester",
+            "source_system": "SPARK",
+            "correlation_id": "",
+            "requested_output": None,
+            "service_category": ""
+        }
+        meta.update(request_meta)
+        return {"request_data": {"inputs": inputs}, "request_meta": meta}
+
+    def execute(self, service, inputs, version_id, **request_meta):
+        """
+        Executes Spark service and returns its outputs dictionary.
+
+        Params:
+        service: name of the Spark service (e.g. BlackScholes)
+        inputs: dictionary of service input values
+        version_id: Spark service version identifier
+        request_meta: additional request_meta fields (e.g. compiler_type)
+        """
+        payload = self.build_payload(inputs, version_id, **request_meta)
+        key = payload_key(service, payload)
+        if self.cache is not None:
+            outputs = self.cache.get(key)
+            if outputs is not None:
+                return outputs
+        return self._single_flight(key, lambda: self._post(service, payload, key))
+
+    def _single_flight(self, key, fetch):
+        """
+        Coalesces concurrent identical requests: first caller for key runs fetch,
+        callers arriving while it's in flight wait for and share its result (or exception).
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            outputs = fetch()
+            future.set_result(outputs)
+            return outputs
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _post(self, service, payload, key):
+        """Posts payload to Spark service, stores outputs in cache and returns them."""
+        if metrics.enabled:
+            outputs = self._post_instrumented(service, json.dumps(payload))
+        else:
+            response = self.session.post(self.service_url(service), data=json.dumps(payload), timeout=self.timeout)
+            response.raise_for_status()
+            outputs = json.loads(response.text)['response_data']['outputs']
+
+        if self.cache is not None:
+            self.cache.set(key, outputs)
+        return outputs
+
+    def _post_instrumented(self, service, body):
+        """Posts request body to Spark service recording round-trip and decode time, payload sizes and errors."""
+        try:
+            start = time.perf_counter()
+            response = self.session.post(self.service_url(service), data=body, timeout=self.timeout)
+            metrics.observe(metrics.SPARK_ROUND_TRIP_SECONDS, time.perf_counter() - start, service=service)
+            metrics.observe(metrics.SPARK_REQUEST_BYTES, len(body.encode('utf-8')), service=service)
+            metrics.observe(metrics.SPARK_RESPONSE_BYTES, len(response.content), service=service)
+            response.raise_for_status()
+
+            start = time.perf_counter()
+            outputs = json.loads(response.text)['response_data']['outputs']
+            metrics.observe(metrics.SPARK_DECODE_SECONDS, time.perf_counter() - start, service=service)
+            return outputs
+        except Exception as e:
+            metrics.record_error('spark', e, service=service)
+            raise
+
+    def execute_many(self, service, inputs_list, version_id, max_workers=None, **request_meta):
+        """
+        Executes Spark service for each inputs dictionary concurrently over pooled connections.
+        Returns list of outputs dictionaries in the same order as inputs_list.
+
+        Params:
+        service: name of the Spark service (e.g. BlackScholes)
+        inputs_list: list of dictionaries of service input values
+        version_id: Spark service version identifier
+        max_workers: number of requests in flight at once, defaults to connection pool size
+        request_meta: additional request_meta fields (e.g. compiler_type)
+        """
+        max_workers = max_workers or self.pool_size
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda inputs: self.execute(service, inputs, version_id, **request_meta), inputs_list))
+
+    def close(self):
+        """Closes all pooled connections."""
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns shared Spark client, creating it with default settings (and in-memory response cache) on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SparkClient(cache=ResponseCache())
+    return _client
+
+
+def configure_client(**kwargs):
+    """
+    Replaces shared Spark client with one created using specified settings (see SparkClient for parameters).
+    Shared client keeps in-memory response cache unless cache is specified (pass cache=None to disable caching).
+    Connections held by the previous client are closed.
+    """
+    global _client
+    kwargs.setdefault('cache', ResponseCache())
+    with _client_lock:
+        previous, _client = _client, SparkClient(**kwargs)
+    if previous is not None:
+        previous.close()
+    return _client
@@ -0,0 +1,206 @@
+# Standard library imports
+import time
+import asyncio
+import json
+
+# Third party imports
+import aiohttp
+
+# Local package imports
+from . import metrics
+from .cache import payload_key
+from .spark import SPARK_BASE_URL, SPARK_HEADERS, RETRY_STATUSES, SparkClient, get_client
+
+
+class AsyncSparkClient:
+    """
+    Class for executing Coherent Spark services from asyncio code.
+    Requests go through one aiohttp session with keep-alive connection pool, while semaphore bounds
+    number of requests in flight, so thousands of prices can be awaited from a single event loop.
+    """
+
+    def __init__(self, base_url=SPARK_BASE_URL, headers=None, max_concurrency=100, pool_size=100,
+                 connect_timeout=3.05, read_timeout=30, max_retries=3, backoff_factor=0.3, cache=None):
+        """
+        Initializes settings of asynchronous Spark client. Session is opened lazily inside running event loop.
+
+        Params:
+        base_url: url of the Spark folder containing pricing services
+        headers: request headers (tenant name and key), defaults to SPARK_HEADERS
+        max_concurrency: maximum number of Spark requests in flight at once
+        pool_size: maximum number of keep-alive connections held open to the Spark host
+        connect_timeout: seconds to wait for establishing the connection
+        read_timeout: seconds to wait for Spark to return the response
+        max_retries: number of retries on connection errors and 429/5xx responses
+        backoff_factor: exponential backoff factor between retries (backoff_factor * 2^(retry - 1) seconds)
+        cache: ResponseCache for outputs of identical requests, caching is disabled if None
+        """
+        self.base_url = base_url.rstrip('/')
+        self.headers = dict(SPARK_HEADERS if headers is None else headers)
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.cache = cache
+
+        self._session = None
+        self._session_guard = None
+        self._closing = None
+        self._semaphore = None
+        self._loop = None
+        # Tasks of requests currently in flight, keyed by payload_key
+        self._inflight = {}
+
+    def _ensure_session(self):
+        """Opens session and semaphore bound to the running event loop (reopened if loop has changed)."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            if self._session is not None and not self._session.closed:
+                self._close_stale_session(loop)
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(headers=self.headers, connector=connector, timeout=self.timeout)
+            # Started generator is finalized by the loop on shutdown (asyncio.run), which closes session inside it
+            self._session_guard = self._close_on_shutdown(self._session)
+            loop.create_task(self._session_guard.__anext__())
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._inflight = {}
+            self._loop = loop
+        return self._session
+
+    @staticmethod
+    async def _close_on_shutdown(session):
+        """Async generator closing session when event loop finalizes it on shutdown."""
+        try:
+            yield
+        finally:
+            if not session.closed:
+                await session.close()
+
+    def _close_stale_session(self, loop):
+        """
+        Closes session opened in previous event loop which didn't close it on shutdown (e.g. loop closed without
+        asyncio.run). Closing doesn't schedule anything in the previous loop (connections of closed loop are dropped),
+        so it runs as task of the current loop.
+        """
+        self._closing = loop.create_task(self._session.close())
+
+    def service_url(self, service):
+        """Returns Execute endpoint url for specified Spark service."""
+        return f'{self.base_url}/{service}/Execute'
+
+    async def execute(self, service, inputs, version_id, **request_meta):
+        """
+        Executes Spark service and returns its outputs dictionary.
+
+        Params:
+        service: name of the Spark service (e.g. BlackScholes)
+        inputs: dictionary of service input values
+        version_id: Spark service version identifier
+        request_meta: additional request_meta fields (e.g. compiler_type)
+        """
+        payload = SparkClient.build_payload(inputs, version_id, **request_meta)
+        key = payload_key(service, payload)
+        if self.cache is not None:
+            outputs = self.cache.get(key)
+            if outputs is not None:
+                return outputs
+
+        # Concurrent identical requests await one shared task (shielded, so one cancelled caller doesn't cancel others)
+        self._ensure_session()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(service, payload, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, service, payload, key):
+        """Posts payload to Spark service, stores outputs in cache and returns them."""
+        outputs = await self._post(service, json.dumps(payload))
+        if self.cache is not None:
+            self.cache.set(key, outputs)
+        return outputs
+
+    async def _post(self, service, payload):
+        """Posts payload with bounded concurrency and retries, returns outputs from Spark response."""
+        if not metrics.enabled:
+            return await self._post_with_retries(service, payload)
+        try:
+            return await self._post_with_retries(service, payload)
+        except Exception as e:
+            metrics.record_error('spark', e, service=service)
+            raise
+
+    async def _post_with_retries(self, service, payload):
+        session = self._ensure_session()
+        url = self.service_url(service)
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                last_attempt = attempt == self.max_retries
+                try:
+                    # Recorded round trip is the one of final attempt, excluding time spent waiting for semaphore
+                    start = time.perf_counter()
+                    async with session.post(url, data=payload) as response:
+                        if response.status in RETRY_STATUSES and not last_attempt:
+                            await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+                            continue
+                        response.raise_for_status()
+                        body = await response.read()
+                    if metrics.enabled:
+                        metrics.observe(metrics.SPARK_ROUND_TRIP_SECONDS, time.perf_counter() - start, service=service)
+                        metrics.observe(metrics.SPARK_REQUEST_BYTES, len(payload.encode('utf-8')), service=service)
+                        metrics.observe(metrics.SPARK_RESPONSE_BYTES, len(body), service=service)
+                        start = time.perf_counter()
+                        outputs = json.loads(body)['response_data']['outputs']
+                        metrics.observe(metrics.SPARK_DECODE_SECONDS, time.perf_counter() - start, service=service)
+                        return outputs
+                    return json.loads(body)['response_data']['outputs']
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if last_attempt:
+                        raise
+                    await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+
+    async def execute_many(self, service, inputs_list, version_id, **request_meta):
+        """
+        Executes Spark service for each inputs dictionary concurrently (bounded by max_concurrency).
+        Returns list of outputs dictionaries in the same order as inputs_list.
+        """
+        return await asyncio.gather(*[self.execute(service, inputs, version_id, **request_meta) for inputs in inputs_list])
+
+    async def close(self):
+        """Closes session and all pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+_client = None
+
+
+def get_async_client():
+    """Returns shared asynchronous Spark client, creating it with default settings on first use.
+    It shares response cache with synchronous shared client."""
+    global _client
+    if _client is None:
+        _client = AsyncSparkClient(cache=get_client().cache)
+    return _client
+
+
+def configure_async_client(**kwargs):
+    """
+    Replaces shared asynchronous Spark client with one created using specified settings
+    (see AsyncSparkClient for parameters). Response cache of synchronous shared client is used unless cache is specified.
+    Previous client should be closed by the caller if its session is open.
+    """
+    global _client
+    kwargs.setdefault('cache', get_client().cache)
+    _client = AsyncSparkClient(**kwargs)
+    return _client
@@ -1,19 +1,21 @@
 # Standard library imports
-import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # Third party imports
-import requests_cache
-import matplotlib.pyplot as plt
-from pandas_datareader import data as wb
+import pandas as pd
+
+# Local package imports
+from .market_data import get_provider
 
 
 class Ticker:
-    """Class for fetcing data from yahoo finance."""
+    """Class for fetcing stock data, from yahoo finance by default (see market_data for other providers)."""
     
     @staticmethod
-    def get_historical_data(ticker, start_date=None, end_date=None, cache_data=True, cache_days=1):
+    def get_historical_data(ticker, start_date=None, end_date=None, cache_data=True, cache_days=1, store=None, provider=None):
         """
-        Fetches stock data from yahoo finance. Request is by default cashed in sqlite db for 1 day.
+        Fetches stock data from market data provider, yahoo finance unless configured otherwise (see market_data.configure_provider).
+        Yahoo requests go through shared pooled session and are by default cashed in sqlite db for 1 day.
         
         Params:
         ticker: ticker symbol
@@ -21,19 +23,16 @@ class Ticker:
         end_date: end date for getting historical data
         cache_date: flag for caching fetched data into slqite db
         cache_days: number of days data will stay in cache 
+        store: PriceStore keeping local history of ticker, data is fetched directly if None
+        provider: MarketDataProvider used instead of configured one
         """
         try:
-            # initializing sqlite for caching yahoo finance requests
-            expire_after = datetime.timedelta(days=1)
-            session = requests_cache.CachedSession(cache_name='cache', backend='sqlite', expire_after=expire_after)
+            fetch = lambda start, end: (provider or get_provider()).get_historical_data(ticker, start, end, cache_data, cache_days)
 
-            # Adding headers to session
-            session.headers = {'User-Agent': 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:89.0) Gecko/20100101 Firefox/89.0', 'Accept': 'application/json;charset=utf-8'}  # noqa
+            if store is not None:
+                return Ticker._get_stored_data(ticker, start_date, end_date, fetch, store)
             
-            if start_date is not None and end_date is not None:
-                data = wb.DataReader(ticker, data_source='yahoo', start=start_date, end=end_date, session=session)
-            else:
-                data = wb.DataReader(ticker, data_source='yahoo', session=session)   #['Adj Close']
+            data = fetch(start_date, end_date)
             if data is None:
                 return None
             return data
@@ -41,6 +40,65 @@ class Ticker:
             print(e)
             return None
 
+    @staticmethod
+    def _get_stored_data(ticker, start_date, end_date, fetch, store):
+        """
+        Brings stored history of ticker up to date and reads requested dates from the store.
+        Only bars newer than the last stored date are fetched (whole history up to today on the first call), plus bars
+        before the first stored date if start_date is earlier. If fetching fails already stored bars are still returned.
+        """
+        today = pd.Timestamp.today().normalize()
+        first_date, last_date = store.first_date(ticker), store.last_date(ticker)
+        if last_date is None:
+            start = start_date
+        else:
+            start = last_date + pd.Timedelta(days=1)
+
+        if first_date is not None and start_date is not None and pd.Timestamp(start_date) < first_date:
+            try:
+                store.prepend(ticker, fetch(start_date, first_date - pd.Timedelta(days=1)))
+            except Exception as e:
+                print(e)
+
+        if start is None:
+            store.append(ticker, fetch(None, today))
+        elif pd.Timestamp(start) <= today:
+            try:
+                store.append(ticker, fetch(start, today))
+            except Exception as e:
+                if last_date is None:
+                    raise
+                print(e)
+        return store.read(ticker, start_date, end_date)
+
+    @staticmethod
+    def get_historical_data_many(tickers, start_date=None, end_date=None, cache_data=True, cache_days=1, max_workers=8,
+                                 store=None, provider=None):
+        """
+        Fetches stock data for many tickers concurrently (at most max_workers requests at once).
+        Returns one dataframe aligned on dates, with columns indexed by (ticker, column name).
+        Tickers which couldn't be fetched are left out.
+        
+        Params:
+        tickers: list of ticker symbols
+        start_date: start date for getting historical data
+        end_date: end date for getting historical data
+        cache_data: flag for caching fetched data into slqite db
+        cache_days: number of days data will stay in cache 
+        max_workers: maximum number of concurrent requests
+        store: PriceStore keeping local histories of tickers, data is fetched directly if None
+        provider: MarketDataProvider used instead of configured one
+        """
+        tickers = list(tickers)
+        fetch = lambda ticker: Ticker.get_historical_data(ticker, start_date, end_date, cache_data, cache_days, store, provider)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = dict(zip(tickers, executor.map(fetch, tickers)))
+
+        frames = {ticker: data for ticker, data in frames.items() if data is not None}
+        if not frames:
+            return None
+        return pd.concat(frames, axis='columns', names=['Ticker', None]).sort_index()
+
     @staticmethod
     def get_columns(data):
         """
@@ -79,6 +137,7 @@ class Ticker:
         column_name: name of the column in dataframe
         """
         try:
+            import matplotlib.pyplot as plt
             if data is None:
                 return
             data[column_name].plot()
@@ -0,0 +1,173 @@
+# Third party imports
+import numpy as np
+
+# Number of parameters of raw SVI slice: a, b, rho, m, s
+SVI_PARAMETERS = 5
+
+# Lee's moment bound on wing slopes of total implied variance: b * (1 + |rho|) <= 2
+SVI_SLOPE_BOUND = 2.0
+
+
+def svi_total_variance(parameters, k):
+    """
+    Evaluates raw SVI parameterisation of total implied variance.
+    Formula: w(k) = a + b * (rho * (k - m) + sqrt((k - m)^2 + s^2))
+
+    Params:
+    parameters: array of (a, b, rho, m, s), or matrix with one such row per evaluated point
+    k: log-moneyness log(K / F)
+    """
+    a, b, rho, m, s = np.moveaxis(np.asarray(parameters, dtype=float), -1, 0)
+    x = k - m
+    return a + b * (rho * x + np.sqrt(x ** 2 + s ** 2))
+
+
+def _raw_svi(x):
+    """
+    Converts fitted variables (minimum total variance, fraction of slope bound, rho, m, s) into raw SVI (a, b, rho, m, s).
+    Minimum of raw SVI is a + b * s * sqrt(1 - rho^2), so non-negative minimum keeps total variance non-negative.
+    """
+    w_min, slope, rho, m, s = x
+    b = slope * SVI_SLOPE_BOUND / (1.0 + np.abs(rho))
+    return np.array([w_min - b * s * np.sqrt(1.0 - rho ** 2), b, rho, m, s])
+
+
+def fit_svi(k, total_variance):
+    """
+    Fits raw SVI slice to total implied variances with bounded least squares.
+    Fit is constrained to arbitrage-free wings: total variance stays non-negative (a + b * s * sqrt(1 - rho^2) >= 0)
+    and wing slopes of total variance satisfy Lee's moment bound b * (1 + |rho|) <= 2 (independent of maturity);
+    constraints are enforced by fitting minimum total variance and fraction of the slope bound instead of a and b.
+    Returns array of parameters (a, b, rho, m, s).
+
+    Params:
+    k: log-moneyness of quotes
+    total_variance: total implied variances (sigma^2 * T) of quotes
+    """
+    from scipy.optimize import least_squares
+    k = np.asarray(k, dtype=float)
+    total_variance = np.asarray(total_variance, dtype=float)
+    if k.size < SVI_PARAMETERS:
+        raise ValueError(f'SVI slice needs at least {SVI_PARAMETERS} quotes, got {k.size}')
+
+    w_max = total_variance.max()
+    rho = -0.3
+    initial = [0.5 * total_variance.min(), 0.1 * (1.0 + abs(rho)) / SVI_SLOPE_BOUND, rho, 0.0, 0.1]
+    lower = [0.0, 0.0, -0.999, 2 * k.min() - 1, 1e-4]
+    upper = [w_max, 1.0, 0.999, 2 * k.max() + 1, 5.0]
+    initial = np.clip(initial, lower, upper)
+
+    result = least_squares(lambda x: svi_total_variance(_raw_svi(x), k) - total_variance, initial, bounds=(lower, upper))
+    return _raw_svi(result.x)
+
+
+class VolSurface:
+    """
+    Class implementing implied volatility surface built from quotes across strikes and expiries.
+    Every expiry slice is fitted with SVI parameterisation of total variance in log-moneyness (constrained to
+    non-negative total variance and Lee's wing slope bound, see fit_svi), and between
+    slices total variance is interpolated linearly in time at fixed log-moneyness (beyond first and last slice
+    implied volatility is kept flat). SVI parameters of all slices are compiled into arrays once and reused by every
+    lookup, so sigma(K, T) costs few arithmetic operations per contract; new quotes refit only the affected slices.
+    Surface is callable, so it can be passed as sigma parameter of pricing models.
+    """
+
+    def __init__(self, underlying_spot_price, risk_free_rate):
+        """
+        Initializes empty surface.
+
+        underlying_spot_price: current stock or other underlying spot price (used for forward prices)
+        risk_free_rate: returns on risk-free assets (used for forward prices)
+        """
+        self.S = underlying_spot_price
+        self.r = risk_free_rate
+
+        # SVI parameters of each slice keyed by time to maturity (years)
+        self.slices = {}
+        self._expiries = None
+        self._parameters = None
+
+    @classmethod
+    def from_quotes(cls, underlying_spot_price, risk_free_rate, strikes, maturities, implied_vols):
+        """
+        Builds surface from quotes, fitting one SVI slice per distinct maturity.
+
+        Params:
+        underlying_spot_price: current stock or other underlying spot price
+        risk_free_rate: returns on risk-free assets
+        strikes: strike prices of quotes
+        maturities: times to maturity of quotes in years
+        implied_vols: implied volatilities of quotes
+        """
+        surface = cls(underlying_spot_price, risk_free_rate)
+        surface.update(strikes, maturities, implied_vols)
+        return surface
+
+    def log_moneyness(self, K, T):
+        """Returns log(K / F) where F is forward price for maturity T."""
+        return np.log(np.asarray(K, dtype=float) / self.S) - self.r * np.asarray(T, dtype=float)
+
+    def update(self, strikes, maturities, implied_vols):
+        """
+        Adds or replaces slices with new quotes. Only maturities present in quotes are refitted.
+
+        Params:
+        strikes: strike prices of quotes
+        maturities: times to maturity of quotes in years
+        implied_vols: implied volatilities of quotes
+        """
+        strikes, maturities, implied_vols = np.broadcast_arrays(
+            *[np.asarray(x, dtype=float).ravel() for x in (strikes, maturities, implied_vols)])
+        valid = np.isfinite(implied_vols) & (implied_vols > 0)
+        strikes, maturities, implied_vols = strikes[valid], maturities[valid], implied_vols[valid]
+
+        for T in np.unique(maturities):
+            in_slice = maturities == T
+            k = self.log_moneyness(strikes[in_slice], T)
+            self.slices[float(T)] = fit_svi(k, implied_vols[in_slice] ** 2 * T)
+        self._expiries = None
+
+    def remove_slice(self, T):
+        """Removes slice with specified time to maturity (years)."""
+        del self.slices[float(T)]
+        self._expiries = None
+
+    def _compile(self):
+        """Stacks slice parameters into arrays sorted by maturity (done once after every update)."""
+        if not self.slices:
+            raise ValueError('Volatility surface has no slices')
+        expiries = sorted(self.slices)
+        self._parameters = np.array([self.slices[T] for T in expiries])
+        self._expiries = np.array(expiries)
+
+    def total_variance(self, K, T):
+        """Returns total implied variance sigma^2 * T for strikes K and times to maturity T (years)."""
+        if self._expiries is None:
+            self._compile()
+        K, T = np.broadcast_arrays(np.asarray(K, dtype=float), np.asarray(T, dtype=float))
+        k = self.log_moneyness(K, T)
+
+        # Slices bracketing each maturity (same slice twice outside of fitted maturities)
+        upper = np.searchsorted(self._expiries, T)
+        lower = np.clip(upper - 1, 0, len(self._expiries) - 1)
+        upper = np.clip(upper, 0, len(self._expiries) - 1)
+        T_lower = self._expiries[lower]
+        T_upper = self._expiries[upper]
+
+        w_lower = svi_total_variance(self._parameters[lower], k)
+        w_upper = svi_total_variance(self._parameters[upper], k)
+        same_slice = T_upper == T_lower
+        weight = np.where(same_slice, 0.0, (T - T_lower) / np.where(same_slice, 1.0, T_upper - T_lower))
+        # Outside fitted maturities total variance scales with time (flat implied volatility)
+        # Fitted slices are non-negative, so are their interpolation and extrapolation
+        w = np.where(same_slice, w_lower * T / T_lower, w_lower + weight * (w_upper - w_lower))
+        return w[()]
+
+    def sigma(self, K, T):
+        """Returns implied volatility for strikes K and times to maturity T (years)."""
+        T = np.asarray(T, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.sqrt(self.total_variance(K, T) / T)[()]
+
+    def __call__(self, K, T):
+        return self.sigma(K, T)
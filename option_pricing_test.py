@@ -1,12 +1,30 @@
 """
 Script testing functionalities of option_pricing package:
 - Testing stock data fetching from Yahoo Finance using pandas-datareader
+- Testing local price history store (incremental append and backfill of earlier history)
 - Testing Black-Scholes option pricing model   
+- Testing parity of local Black-Scholes backend with recorded Spark service outputs   
 - Testing Binomial option pricing model   
 - Testing Monte Carlo Simulation for option pricing   
+- Testing error metrics (one failure counted once through nested instrumented calls)
+- Testing SVI volatility surface fit (no-arbitrage wing constraints)
+- Testing pricing HTTP service (validation, unknown models, JSON and Arrow batch responses)
 """
 
-from option_pricing import BlackScholesModel, MonteCarloPricing, BinomialTreeModel, Ticker
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from option_pricing import BlackScholesModel, MonteCarloPricing, BinomialTreeModel, Ticker, implied_volatility
+from option_pricing import InMemoryProvider, PriceStore, metrics
+from option_pricing.BlackScholesModel import black_scholes
+from option_pricing.base import CONTRACT_COLUMNS
+from option_pricing.volatility_surface import SVI_SLOPE_BOUND, fit_svi
+
+# Spark BlackScholes responses recorded for parity test of local backend
+SPARK_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'spark_black_scholes_outputs.csv')
 
 # Fetching the prices from yahoo finance
 data = Ticker.get_historical_data('TSLA')
@@ -14,11 +32,72 @@ print(Ticker.get_columns(data))
 print(Ticker.get_last_price(data, 'Adj Close'))
 Ticker.plot_data(data, 'TSLA', 'Adj Close')
 
+# Price store testing: history seeded from 2020 is backfilled when earlier start date is requested
+dates = pd.bdate_range('2015-01-01', '2021-12-31', name='Date')
+history = pd.DataFrame({'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': np.arange(len(dates), dtype=float)}, index=dates)
+provider = InMemoryProvider({'TEST': history})
+with tempfile.TemporaryDirectory() as directory:
+    store = PriceStore(directory)
+    seeded = Ticker.get_historical_data('TEST', start_date='2020-01-01', store=store, provider=provider)
+    assert seeded.index[0] == pd.Timestamp('2020-01-01') and seeded.index[-1] == dates[-1]
+    backfilled = Ticker.get_historical_data('TEST', start_date='2015-01-01', store=store, provider=provider)
+    assert backfilled.index.equals(dates) and np.array_equal(backfilled['Close'], history['Close'])
+    assert store.first_date('TEST') == dates[0] and store.last_date('TEST') == dates[-1]
+    del seeded, backfilled
+
 # Black-Scholes model testing
 BSM = BlackScholesModel(100, 100, 365, 0.1, 0.2)
 print(BSM.calculate_option_price('Call Option'))
 print(BSM.calculate_option_price('Put Option'))
 
+# Local Black-Scholes backend testing (reference values: Hull, Options, Futures and Other Derivatives, Example 15.6)
+BSM_local = BlackScholesModel(42, 40, 182.5, 0.1, 0.2, backend='local')
+assert abs(BSM_local.calculate_option_price('Call Option')['callprice'] - 4.76) < 0.005
+assert abs(BSM_local.calculate_option_price('Put Option') - 0.81) < 0.005
+
+# Implied volatility testing: local Black-Scholes prices are inverted back to their volatilities
+sigmas = np.linspace(0.05, 1.0, 20)
+call_prices = BlackScholesModel.price_batch(pd.DataFrame({'S': 100, 'K': 110, 'T': 0.5, 'r': 0.05, 'sigma': sigmas}), backend='local')['callprice']
+assert np.allclose(implied_volatility(call_prices, 100, 110, 0.5, 0.05), sigmas, atol=1e-6)
+
+# Error metrics testing: failure of calculate_prices inside calculate_option_price increments error counter once
+metrics.enable()
+metrics.reset()
+try:
+    BinomialTreeModel(100, 100, 365, 0.1, 0.2, 'steps').calculate_option_price('Call Option')
+except Exception:
+    pass
+errors = {labels: value for (name, labels), value in metrics.registry.snapshot()['counters'].items()
+          if name == metrics.ERRORS}
+assert sum(errors.values()) == 1, errors
+metrics.disable()
+metrics.reset()
+
+# SVI fit testing: steep short-dated smile is fitted within Lee's wing slope bound and with
+# non-negative total variance
+T = 0.05
+k = np.linspace(-0.4, 0.4, 17)
+implied_vols = np.sqrt((0.002 + 3.0 * np.abs(k)) / T)
+a, b, rho, m, s = fit_svi(k, implied_vols ** 2 * T)
+assert b * (1 + abs(rho)) <= SVI_SLOPE_BOUND + 1e-9
+assert a + b * s * np.sqrt(1 - rho ** 2) >= -1e-12
+
+# Parity of local backend with Spark outputs over grid of contracts: Spark responses are recorded once into
+# fixture file (when it is missing and Spark is reachable), afterwards black_scholes is checked against it offline.
+# Recorded Greeks are compared as they are, in units of black_scholes (Theta per year, Vega per unit of volatility,
+# Rho per unit of interest rate)
+S, K, T = np.meshgrid([80, 100, 120], [90, 100, 110], [0.25, 1.0])
+contracts = pd.DataFrame({'S': S.ravel(), 'K': K.ravel(), 'T': T.ravel(), 'r': 0.05, 'sigma': 0.25})
+greek_columns = ['callprice', 'putprice', 'Delta', 'Gamma', 'Theta', 'Vega', 'Rho']
+if not os.path.exists(SPARK_FIXTURE):
+    os.makedirs(os.path.dirname(SPARK_FIXTURE), exist_ok=True)
+    pd.concat([contracts, BlackScholesModel.price_batch(contracts)], axis=1).to_csv(SPARK_FIXTURE, index=False)
+recorded = pd.read_csv(SPARK_FIXTURE)
+assert np.allclose(recorded[CONTRACT_COLUMNS], contracts[CONTRACT_COLUMNS])
+local_outputs = black_scholes(*[recorded[column].values for column in CONTRACT_COLUMNS])
+for column in greek_columns:
+    assert np.allclose(recorded[column], local_outputs[column], rtol=1e-6, atol=1e-6), column
+
 # Binomial model testing
 BOPM = BinomialTreeModel(100, 100, 365, 0.1, 0.2, 15000)
 print(BOPM.calculate_option_price('Call Option'))
@@ -32,3 +111,45 @@ print(MC.calculate_option_price('Put Option'))
 MC.plot_simulation_results(20)
 
 
+
+# Local Monte Carlo backend testing against closed-form Black-Scholes price
+MC_local = MonteCarloPricing(100, 100, 365, 0.1, 0.2, 1000000, backend='local', seed=20)
+MC_output = MC_local.calculate_option_price('Call Option')
+BSM_output = BlackScholesModel(100, 100, 365, 0.1, 0.2, backend='local').calculate_option_price('Call Option')
+print(MC_output)
+assert abs(MC_output['CallPrice'] - BSM_output['callprice']) < 4 * MC_output['CallStdError']
+assert abs(MC_output['PutPrice'] - BSM_output['putprice']) < 4 * MC_output['PutStdError']
+
+
+# Pricing HTTP service testing
+import pyarrow as pa
+from starlette.testclient import TestClient
+from option_pricing.service import app
+
+client = TestClient(app)
+contract = {'S': 42, 'K': 40, 'T': 0.5, 'r': 0.1, 'sigma': 0.2}
+response = client.post('/price/black_scholes', json=contract)
+assert response.status_code == 200 and abs(response.json()['callprice'] - 4.76) < 0.005
+# Invalid requests are rejected with 422, unknown models with 404
+assert client.post('/price/black_scholes', json={'S': 42, 'K': 40, 'T': 0.5, 'r': 0.1}).status_code == 422
+assert client.post('/price/black_scholes', json=dict(contract, sigma='high')).status_code == 422
+assert client.post('/price/black_scholes', content=b'not json').status_code == 422
+assert client.post('/price/trinomial', json=contract).status_code == 404
+# Richardson extrapolation needs at least 2 steps and Leisen-Reimer or BBS lattice
+assert client.post('/price/binomial', json=dict(contract, number_of_time_steps=1, tree_type='bbs', richardson=True)).status_code == 422
+assert client.post('/price/binomial', json=dict(contract, number_of_time_steps=100, richardson=True)).status_code == 422
+assert client.post('/price/binomial', json=dict(contract, number_of_time_steps=2, tree_type='bbs', richardson=True)).status_code == 200
+# Total work of batch is limited, not only work of single contract
+batch = {'contracts': {column: [value] * 1000 for column, value in contract.items()}}
+assert client.post('/price/binomial/batch', json=dict(batch, number_of_time_steps=10000)).status_code == 422
+assert client.post('/price/monte_carlo/batch', json=dict(batch, number_of_simulations=1_000_000)).status_code == 422
+
+# Batch responses in JSON and Arrow format hold the same prices as local batch pricing
+batch_contracts = pd.DataFrame({'S': 100.0, 'K': [90.0, 100.0, 110.0], 'T': 0.5, 'r': 0.05, 'sigma': 0.25})
+batch = {'contracts': batch_contracts.to_dict(orient='records'), 'backend': 'local'}
+expected = BlackScholesModel.price_batch(batch_contracts, backend='local')
+json_results = pd.DataFrame(client.post('/price/black_scholes/batch', json=batch).json()['results'])
+response = client.post('/price/black_scholes/batch?format=arrow', json=batch)
+assert response.headers['content-type'] == 'application/vnd.apache.arrow.stream'
+arrow_results = pa.ipc.open_stream(response.content).read_all().to_pandas()
+assert np.allclose(json_results[expected.columns], expected) and np.allclose(arrow_results[expected.columns], expected)
@@ -1,5 +1,9 @@
 # Standart python imports
+import time
+import threading
 from enum import Enum
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import plotly.express as px
 import pandas as pd
@@ -10,9 +14,12 @@ import streamlit.components.v1 as components
 import streamlit as st
 
 # Local package imports
-from option_pricing import BlackScholesModel, MonteCarloPricing, BinomialTreeModel, Ticker
+from option_pricing import BlackScholesModel, MonteCarloPricing, BinomialTreeModel, Ticker, historical_volatility
+from option_pricing.BinomialTreeModel import TREE_TYPE
+
+# Maximum number of pricing results kept by the app (least recently used are evicted first)
+PRICING_CACHE_SIZE = 128
 
-history_df = pd.DataFrame()
 class OPTION_PRICING_MODEL(Enum):
     BLACK_SCHOLES = 'Black Scholes Model'
     MONTE_CARLO = 'Monte Carlo Simulation'
@@ -23,6 +30,85 @@ def get_historical_data(ticker):
     """Getting historical data for speified ticker and caching it with streamlit app."""
     return Ticker.get_historical_data(ticker)
 
+
+class PricingJob:
+    """Pricing calculation running in background thread, with fraction of work done reported by the model."""
+
+    def __init__(self):
+        self.progress = 0.0
+        self.future = None
+
+    def set_progress(self, progress):
+        self.progress = progress
+
+
+class PricingJobs:
+    """
+    Pricing results shared by all sessions and reruns of the app, keyed by (model, inputs).
+    Calculations run in thread pool, so the script thread only polls them (updating status element, see calculate):
+    rerun triggered by widget change doesn't wait for running calculation, and asking again for the same inputs
+    picks up running or finished job.
+    At most PRICING_CACHE_SIZE jobs are kept, least recently used finished jobs are evicted first.
+    """
+
+    def __init__(self, maxsize=PRICING_CACHE_SIZE, max_workers=4):
+        self.maxsize = maxsize
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, key, calculate):
+        """Returns job for key, starting calculate(progress_callback) in background if there's no such job yet."""
+        with self.lock:
+            job = self.jobs.get(key)
+            # Failed calculations aren't kept, so they're retried on next request
+            if job is None or (job.future.done() and job.future.exception() is not None):
+                job = PricingJob()
+                job.future = self.executor.submit(calculate, job.set_progress)
+                self.jobs[key] = job
+            self.jobs.move_to_end(key)
+
+            finished = [k for k, j in self.jobs.items() if j.future.done()]
+            while len(self.jobs) > self.maxsize and finished:
+                del self.jobs[finished.pop(0)]
+        return job
+
+
+@st.experimental_singleton
+def get_pricing_jobs():
+    """Getting pricing jobs shared by all sessions of the app."""
+    return PricingJobs()
+
+
+def calculate(model, inputs, calculate_price, show_progress=False):
+    """
+    Returns pricing result for model and inputs, calculated once by calculate_price(progress_callback)
+    and served from shared results afterwards. Waits for the result polling progress of the calculation.
+    """
+    job = get_pricing_jobs().submit((model, inputs), calculate_price)
+    if job.future.done():
+        return job.future.result()
+
+    # Streamlit stops script for rerun only when the script updates some element, so status is updated on every poll
+    # (with time.sleep alone widget change would wait for the calculation to finish)
+    progress_bar = st.progress(0) if show_progress else None
+    status = st.empty()
+    start = time.monotonic()
+    while not job.future.done():
+        if progress_bar is not None:
+            progress_bar.progress(min(int(job.progress * 100), 100))
+        status.caption(f'Calculating... {time.monotonic() - start:.1f} s')
+        time.sleep(0.1)
+    if progress_bar is not None:
+        progress_bar.progress(100)
+    status.empty()
+    return job.future.result()
+
+
+# Pricing history of the session, kept across reruns
+if 'history_df' not in st.session_state:
+    st.session_state.history_df = pd.DataFrame()
+
 # Ignore the Streamlit warning for using st.pyplot()
 st.set_option('deprecation.showPyplotGlobalUse', False)
 
@@ -98,11 +184,9 @@ if pricing_method == OPTION_PRICING_MODEL.BLACK_SCHOLES.value:
     strike_price = st.number_input('Strike price', 0)
     risk_free_rate = st.slider('Risk-free rate (%)', 0, 100, 10)
     sigma = st.slider('Sigma (%)', 0, 100, 20)
+    use_historical_sigma = st.checkbox('Estimate sigma from historical data (Yang-Zhang, 21 days)')
     exercise_date = st.date_input('Exercise date', min_value=datetime.today() + timedelta(days=1), value=datetime.today() + timedelta(days=365))
     
-    inputs_dict = {'ticker':ticker, 'strike_price':strike_price, 'risk_free_rate':risk_free_rate, 'sigma':sigma, 'exercise_date':exercise_date}
-    inputs_df = pd.DataFrame(inputs_dict, index=[0,])
-    
     if st.button(f'Calculate option price for {ticker}'):
         # Getting data for selected ticker
         data = get_historical_data(ticker)
@@ -114,12 +198,19 @@ if pricing_method == OPTION_PRICING_MODEL.BLACK_SCHOLES.value:
         # Formating selected model parameters
         spot_price = Ticker.get_last_price(data, 'Adj Close') 
         risk_free_rate = risk_free_rate / 100
-        sigma = sigma / 100
+        sigma = historical_volatility(data).iloc[-1] if use_historical_sigma else sigma / 100
         days_to_maturity = (exercise_date - datetime.now().date()).days
+        if use_historical_sigma:
+            st.caption(f'Sigma estimated from historical data: {sigma:.2%}')
+
+        # Inputs recorded in history are the ones used for pricing (rates as fractions)
+        inputs_dict = {'ticker':ticker, 'strike_price':strike_price, 'risk_free_rate':risk_free_rate, 'sigma':sigma, 'exercise_date':exercise_date}
+        inputs_df = pd.DataFrame(inputs_dict, index=[0,])
 
         # Calculating option price
-        BSM = BlackScholesModel(spot_price, strike_price, days_to_maturity, risk_free_rate, sigma)
-        options_output = BSM.calculate_option_price('Call Option')
+        inputs = (spot_price, strike_price, days_to_maturity, risk_free_rate, sigma)
+        options_output = calculate(OPTION_PRICING_MODEL.BLACK_SCHOLES.value, inputs,
+                                   lambda progress: BlackScholesModel(*inputs).calculate_option_price('Call Option'))
 
         call_option_price = options_output['callprice']
         put_option_price = options_output['putprice']
@@ -136,10 +227,10 @@ if pricing_method == OPTION_PRICING_MODEL.BLACK_SCHOLES.value:
         
         # Displaying call/put option price
         st.dataframe(outputs_df)
-        history_df = history_df.append(concat_df)
+        st.session_state.history_df = pd.concat([st.session_state.history_df, concat_df])
         
         expander = st.expander("See history")
-        expander.write(history_df)
+        expander.write(st.session_state.history_df)
         
         
 
@@ -152,6 +243,7 @@ elif pricing_method == OPTION_PRICING_MODEL.MONTE_CARLO.value:
     strike_price = st.number_input('Strike price', 0)
     risk_free_rate = st.slider('Risk-free rate (%)', 0, 100, 10)
     sigma = st.slider('Sigma (%)', 0, 100, 20)
+    use_historical_sigma = st.checkbox('Estimate sigma from historical data (Yang-Zhang, 21 days)')
     exercise_date = st.date_input('Exercise date', min_value=datetime.today() + timedelta(days=1), value=datetime.today() + timedelta(days=365))
     number_of_simulations = st.slider('Number of simulations', 100, 5000, 100)
     num_of_movements = st.slider('Number of price movement simulations to be visualized ', 0, int(number_of_simulations/10), 100)
@@ -166,14 +258,15 @@ elif pricing_method == OPTION_PRICING_MODEL.MONTE_CARLO.value:
         # Formating simulation parameters
         spot_price = Ticker.get_last_price(data, 'Adj Close') 
         risk_free_rate = risk_free_rate / 100
-        sigma = sigma / 100
+        sigma = historical_volatility(data).iloc[-1] if use_historical_sigma else sigma / 100
         days_to_maturity = (exercise_date - datetime.now().date()).days
+        if use_historical_sigma:
+            st.caption(f'Sigma estimated from historical data: {sigma:.2%}')
 
-        # ESimulating stock movements
-        MC = MonteCarloPricing(spot_price, strike_price, days_to_maturity, risk_free_rate, sigma, number_of_simulations)
-
-        # Calculating call/put option price
-        options_output = MC.calculate_option_price('Call Option')
+        # ESimulating stock movements and calculating call/put option price
+        inputs = (spot_price, strike_price, days_to_maturity, risk_free_rate, sigma, number_of_simulations)
+        options_output = calculate(OPTION_PRICING_MODEL.MONTE_CARLO.value, inputs,
+                                   lambda progress: MonteCarloPricing(*inputs).calculate_option_price('Call Option'))
         
         call_option_price = options_output['CallPrice']
         put_option_price = options_output['PutPrice']
@@ -194,8 +287,12 @@ elif pricing_method == OPTION_PRICING_MODEL.BINOMIAL.value:
     strike_price = st.number_input('Strike price', 300)
     risk_free_rate = st.slider('Risk-free rate (%)', 0, 100, 10)
     sigma = st.slider('Sigma (%)', 0, 100, 20)
+    use_historical_sigma = st.checkbox('Estimate sigma from historical data (Yang-Zhang, 21 days)')
     exercise_date = st.date_input('Exercise date', min_value=datetime.today() + timedelta(days=1), value=datetime.today() + timedelta(days=365))
-    number_of_time_steps = st.slider('Number of time steps', 5000, 100000, 15000)
+    tree_type = st.selectbox('Lattice type', [tree.value for tree in TREE_TYPE])
+    # Richardson extrapolation needs smooth convergence, which CRR lattice doesn't have
+    richardson = tree_type != TREE_TYPE.CRR.value and st.checkbox('Richardson extrapolation')
+    number_of_time_steps = st.slider('Number of time steps', 100, 100000, 15000)
 
     if st.button(f'Calculate option price for {ticker}'):
          # Getting data for selected ticker
@@ -207,13 +304,16 @@ elif pricing_method == OPTION_PRICING_MODEL.BINOMIAL.value:
         # Formating simulation parameters
         spot_price = Ticker.get_last_price(data, 'Adj Close') 
         risk_free_rate = risk_free_rate / 100
-        sigma = sigma / 100
+        sigma = historical_volatility(data).iloc[-1] if use_historical_sigma else sigma / 100
         days_to_maturity = (exercise_date - datetime.now().date()).days
-
-        # Calculating option price
-        BOPM = BinomialTreeModel(spot_price, strike_price, days_to_maturity, risk_free_rate, sigma, number_of_time_steps)
-        call_option_price = BOPM.calculate_option_price('Call Option')
-        put_option_price = BOPM.calculate_option_price('Put Option')
+        if use_historical_sigma:
+            st.caption(f'Sigma estimated from historical data: {sigma:.2%}')
+
+        # Calculating option price in background, long trees report progress of lattice rollback
+        inputs = (spot_price, strike_price, days_to_maturity, risk_free_rate, sigma, number_of_time_steps, tree_type, richardson)
+        call_option_price, put_option_price = calculate(
+            OPTION_PRICING_MODEL.BINOMIAL.value, inputs,
+            lambda progress: BinomialTreeModel(*inputs, progress=progress).calculate_prices(), show_progress=True)
 
         # Displaying call/put option price
         st.subheader(f'Call option price: {call_option_price}')